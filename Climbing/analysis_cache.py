@@ -0,0 +1,149 @@
+"""
+Analysis Cache
+--------------
+Content-addressed cache for route analysis results.
+
+Entries are keyed by a SHA-256 of the decoded image bytes plus the analysis
+parameters, so re-uploads of the same photo (or repeated demo requests) skip
+the whole detection and planning pipeline.
+
+Two tiers:
+- an in-memory LRU holding the most recent results
+- an optional on-disk tier (one JSON file per key) with size-based eviction
+  of the least recently used files
+
+Usage:
+    cache = AnalysisCache(max_entries=128, disk_dir="cache", max_disk_bytes=50_000_000)
+    key = cache.key(image_bytes, {"k": 1})
+    route_json = cache.get(key)
+    if route_json is None:
+        route_json = analyze(...)
+        cache.put(key, route_json)
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class AnalysisCache:
+    def __init__(self, max_entries=128, disk_dir=None, max_disk_bytes=100 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0,
+                      "memory_evictions": 0, "disk_evictions": 0}
+
+        # key -> (size in bytes, last access time) for the disk tier
+        self._disk_index = {}
+        self._disk_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            for entry in os.scandir(disk_dir):
+                if entry.name.endswith(".json"):
+                    st = entry.stat()
+                    self._disk_index[entry.name[:-5]] = (st.st_size, st.st_mtime)
+                    self._disk_bytes += st.st_size
+
+    @staticmethod
+    def key(image_bytes, params=None):
+        """Hash of the image bytes plus the (JSON-serialisable) analysis parameters"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(params or {}, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached route JSON for key, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._memory[key]
+
+            route_json = self._read_disk(key)
+            if route_json is None:
+                self.stats["misses"] += 1
+                return None
+
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            self._remember(key, route_json)
+            return route_json
+
+    def put(self, key, route_json):
+        """Store a route JSON under key in both tiers"""
+        with self._lock:
+            self._remember(key, route_json)
+            self._write_disk(key, route_json)
+
+    def snapshot(self):
+        """Counters plus current tier sizes, for monitoring"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats,
+                        hit_rate=self.stats["hits"] / lookups if lookups else 0.0,
+                        memory_entries=len(self._memory),
+                        disk_entries=len(self._disk_index),
+                        disk_bytes=self._disk_bytes)
+
+    # ---------------- internals (call with the lock held) ----------------
+
+    def _remember(self, key, route_json):
+        self._memory[key] = route_json
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["memory_evictions"] += 1
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir or key not in self._disk_index:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                route_json = json.load(f)
+        except (OSError, ValueError):
+            self._forget_disk(key)
+            return None
+        os.utime(self._path(key))  # mtime doubles as the LRU timestamp
+        self._disk_index[key] = (self._disk_index[key][0], os.path.getmtime(self._path(key)))
+        return route_json
+
+    def _write_disk(self, key, route_json):
+        if not self.disk_dir:
+            return
+        data = json.dumps(route_json).encode("utf-8")
+        if len(data) > self.max_disk_bytes:
+            return
+
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+
+        if key in self._disk_index:
+            self._disk_bytes -= self._disk_index[key][0]
+        self._disk_index[key] = (len(data), os.path.getmtime(self._path(key)))
+        self._disk_bytes += len(data)
+
+        # Evict least recently used files until we are back under quota
+        for old_key, _ in sorted(self._disk_index.items(), key=lambda kv: kv[1][1]):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            if old_key != key:
+                self._forget_disk(old_key)
+                self.stats["disk_evictions"] += 1
+
+    def _forget_disk(self, key):
+        size, _ = self._disk_index.pop(key, (0, 0))
+        self._disk_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
@@ -0,0 +1,180 @@
+"""batch_routes.py
+Batch route planning for whole archives of wall photos.
+
+Fans the images of a directory or glob out over a process pool.  Every
+worker imports OpenCV/networkx once when it starts, instead of once per
+image as with one route_planner_backend.py launch per photo.  Results are
+streamed to a JSONL file, one line per image, as soon as each finishes:
+
+    {"image": "walls/a.jpg", "status": "ok", "holds": 42, "moves": 9,
+     "cost": 1234.5, "steps": [...], "seconds": 0.41}
+    {"image": "walls/b.jpg", "status": "error", "error": "..."}
+
+The output file doubles as the progress record: re-running the same command
+skips every image that already has an "ok" line, so a crash or Ctrl-C only
+loses the images that were in flight.  Failed images are retried.
+
+Usage:
+    python batch_routes.py walls/ --out routes.jsonl --workers 8
+    python batch_routes.py "archive/**/*.jpg" --out routes.jsonl --alternatives 3
+"""
+
+import io
+import os
+import sys
+import json
+import glob
+import time
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+IN_FLIGHT_PER_WORKER = 4  # images queued ahead per worker
+
+
+def find_images(sources):
+    """Sorted image paths from directories (searched recursively) and glob patterns"""
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                paths.update(os.path.join(root, f) for f in files
+                             if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.update(p for p in glob.glob(source, recursive=True)
+                         if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(paths)
+
+
+def completed_images(out_path):
+    """Images with an "ok" line in an existing output file
+
+    A line cut short by a crash is dropped from the file so that new lines
+    start cleanly.
+    """
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("status") == "ok":
+            done.add(record["image"])
+    return done
+
+
+def _warm_worker():
+    """Pool initializer: pay the heavy imports once per worker process"""
+    import route_planner_backend  # noqa: F401  (pulls in cv2, numpy, networkx)
+
+
+def analyze_image(path, options):
+    """Plan the route for one image; returns its JSONL record (never raises)"""
+    import route_planner_backend as backend
+
+    start = time.perf_counter()
+    record = {"image": path, "status": "ok"}
+    try:
+        with redirect_stdout(io.StringIO()):  # keep per-image chatter out of the batch log
+            holds = backend.color_based_hold_detection(path, mode=options["mode"], max_side=options["max_side"])
+        record["holds"] = len(holds)
+        if len(holds) < 2:
+            raise ValueError("not enough holds detected")
+        G = backend.build_route_graph(holds, reach=options["reach"])
+        routes = backend.find_optimal_routes(G, k=options["alternatives"])
+        if not routes:
+            raise ValueError("no path found from bottom to top")
+
+        record["moves"] = len(routes[0]["route"])
+        record["cost"] = routes[0]["cost"]
+        record["steps"] = backend.route_to_steps(routes[0]["route"], G)
+        if options["alternatives"] > 1:
+            record["alternatives"] = [{"rank": r["rank"], "cost": r["cost"],
+                                       "steps": backend.route_to_steps(r["route"], G)} for r in routes[1:]]
+    except Exception as exc:
+        record["status"] = "error"
+        record["error"] = f"{type(exc).__name__}: {exc}"
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def run_batch(images, out_path, options, workers=None):
+    """Analyze images on a process pool, appending one line per image to out_path
+
+    Returns {"ok": n, "error": n, "skipped": n}.
+    """
+    done = completed_images(out_path)
+    todo = [p for p in images if p not in done]
+    counts = {"ok": 0, "error": 0, "skipped": len(images) - len(todo)}
+    if counts["skipped"]:
+        print(f"Resuming: {counts['skipped']} of {len(images)} images already done")
+    if not todo:
+        return counts
+
+    workers = workers or os.cpu_count() or 1
+    pending = iter(todo)
+    start = time.perf_counter()
+    with open(out_path, "a") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker) as pool:
+        in_flight = set()
+        while True:
+            # Keep a bounded number of images queued instead of submitting the whole archive
+            while len(in_flight) < workers * IN_FLIGHT_PER_WORKER:
+                path = next(pending, None)
+                if path is None:
+                    break
+                in_flight.add(pool.submit(analyze_image, path, options))
+            if not in_flight:
+                break
+
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                counts[record["status"]] += 1
+                n = counts["ok"] + counts["error"]
+                detail = f"{record['moves']} moves" if record["status"] == "ok" else record["error"]
+                print(f"[{n}/{len(todo)}] {record['image']}: {detail} ({record['seconds']:.2f}s)")
+
+    elapsed = time.perf_counter() - start
+    print(f"{counts['ok'] + counts['error']} images in {elapsed:.1f}s "
+          f"({(counts['ok'] + counts['error']) / elapsed:.2f} images/s)")
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    from cli_args import positive_float
+
+    parser = argparse.ArgumentParser(description="Plan routes for a directory or glob of wall photos")
+    parser.add_argument("sources", nargs="+", help="Image directories and/or glob patterns (quote them)")
+    parser.add_argument("--out", default="routes.jsonl", help="JSONL output; also used to resume")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--mode", choices=["contours", "labels"], default="contours",
+                        help="Hold segmentation: per-colour contours or single-pass labelling")
+    parser.add_argument("--max-side", type=int, default=None,
+                        help="Detect on a copy downscaled so its longest side is at most this many pixels")
+    parser.add_argument("--reach", type=positive_float, default=None,
+                        help="Max move length in pixels (default: half the wall extent, "
+                             "widened if no route fits)")
+    parser.add_argument("--alternatives", type=int, default=1, metavar="K",
+                        help="Also record the next K-1 cheapest routes for each image")
+    args = parser.parse_args()
+
+    images = find_images(args.sources)
+    if not images:
+        raise SystemExit("No images found")
+    options = {"mode": args.mode, "max_side": args.max_side, "reach": args.reach,
+               "alternatives": max(1, args.alternatives)}
+    counts = run_batch(images, args.out, options, workers=args.workers)
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} skipped -> {args.out}")
+    if counts["error"]:
+        sys.exit(1)
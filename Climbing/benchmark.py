@@ -0,0 +1,164 @@
+"""benchmark.py
+Benchmark suite for the route pipelines on seeded synthetic walls.
+
+Times each stage separately so regressions can be pinned down as the number
+of holds grows:
+- detect_contours / detect_labels   colour detection (route_planner_backend)
+- graph_dense / graph_sparse        hold graph construction
+- path_search                       find_optimal_route on the sparse graph
+- limb_placement                    ClimbingRouteAnalyzer.suggest_limb_placements
+                                    over a route that climbs every hold
+- instructions                      ClimbingRouteAnalyzer.generate_route_instructions
+- json                              serialising the /analyze route JSON
+- simple_planner                    simple_route_planner.generate_predefined_route
+
+Each timing is the best of --repeat runs.  Results are written as JSON and can
+be compared against an earlier run to flag regressions.
+
+Usage:
+    python benchmark.py --out benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json --tolerance 0.25
+"""
+
+import json
+import time
+import platform
+
+import cv2
+import numpy as np
+
+import route_planner_backend as backend
+import simple_route_planner
+from route_analyzer import ClimbingRouteAnalyzer
+from synthetic_wall import generate_wall
+
+DEFAULT_HOLD_COUNTS = [10, 100, 1000]
+DEFAULT_RESOLUTIONS = ["800x1200", "2000x3000"]
+DENSE_GRAPH_LIMIT = 500  # skip the O(n²) builder above this many holds
+
+
+def best_time(fn, repeat):
+    """Best wall-clock time of repeat calls to fn, and fn's last result"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def ladder_route(holds):
+    """Analyzer route steps that visit every hold from the bottom up"""
+    ordered = sorted(holds, key=lambda h: h["y"], reverse=True)
+    return [{
+        "step": idx + 1,
+        "hold_id": h["id"],
+        "x": h["x"],
+        "y": h["y"],
+        "color": h["color"],
+        "size": h["size"],
+        "type": h["type"],
+    } for idx, h in enumerate(ordered)]
+
+
+def run_case(n_holds, width, height, repeat, seed=0):
+    """Time every stage on one synthetic wall; returns {stage: seconds}"""
+    img, holds = generate_wall(n_holds, width, height, seed=seed)
+    timings = {}
+
+    timings["detect_contours"], _ = best_time(lambda: backend.detect_holds_in_image(img, mode="contours"), repeat)
+    timings["detect_labels"], _ = best_time(lambda: backend.detect_holds_in_image(img, mode="labels"), repeat)
+
+    if n_holds <= DENSE_GRAPH_LIMIT:
+        timings["graph_dense"], _ = best_time(lambda: backend.build_hold_graph(holds), repeat)
+    timings["graph_sparse"], G = best_time(lambda: backend.build_sparse_hold_graph(holds), repeat)
+    timings["path_search"], _ = best_time(lambda: backend.find_optimal_route(G), repeat)
+
+    analyzer = ClimbingRouteAnalyzer()
+    analyzer.holds = holds
+    analyzer.route = ladder_route(holds)
+    timings["limb_placement"], _ = best_time(analyzer.suggest_limb_placements, repeat)
+    timings["instructions"], instructions = best_time(analyzer.generate_route_instructions, repeat)
+
+    route_json = {
+        "route_info": {"total_steps": len(instructions), "difficulty": "intermediate", "image": "synthetic"},
+        "holds": holds,
+        "instructions": instructions,
+    }
+    timings["json"], _ = best_time(lambda: json.dumps(route_json), repeat)
+    return timings
+
+
+def run_suite(hold_counts, resolutions, repeat):
+    """Run every (resolution, hold count) case; returns the result document"""
+    results = []
+    for res in resolutions:
+        width, height = (int(v) for v in res.lower().split("x"))
+        for n_holds in hold_counts:
+            case = f"holds={n_holds} res={width}x{height}"
+            try:
+                timings = run_case(n_holds, width, height, repeat)
+            except ValueError as exc:  # too many holds for this resolution
+                print(f"skip {case}: {exc}")
+                continue
+            for stage, seconds in timings.items():
+                results.append({"case": case, "holds": n_holds, "resolution": f"{width}x{height}",
+                                "stage": stage, "seconds": seconds})
+            print(case + "  " + "  ".join(f"{s}={t * 1000:.2f}ms" for s, t in timings.items()))
+
+    seconds, _ = best_time(simple_route_planner.generate_predefined_route, repeat)
+    results.append({"case": "predefined", "holds": 11, "resolution": "800x1200",
+                    "stage": "simple_planner", "seconds": seconds})
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "repeat": repeat,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, tolerance, min_delta=0.001):
+    """List (case, stage, old, new) where new is slower than old by more than
+    tolerance (fraction) and by at least min_delta seconds"""
+    old = {(r["case"], r["stage"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        key = (r["case"], r["stage"])
+        if key in old and r["seconds"] > old[key] * (1 + tolerance) and r["seconds"] - old[key] >= min_delta:
+            regressions.append((r["case"], r["stage"], old[key], r["seconds"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the route pipelines on synthetic walls")
+    parser.add_argument("--holds", type=int, nargs="+", default=DEFAULT_HOLD_COUNTS, help="Hold counts to test")
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS, help="WIDTHxHEIGHT sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (best is kept)")
+    parser.add_argument("--out", default="benchmark_results.json", help="Where to save the results JSON")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    report = run_suite(args.holds, args.resolutions, args.repeat)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results for {len(report['results'])} stage timings saved to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        for case, stage, old, new in regressions:
+            print(f"REGRESSION {case} {stage}: {old * 1000:.2f}ms -> {new * 1000:.2f}ms")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline")
@@ -0,0 +1,21 @@
+"""
+CLI Args
+--------
+argparse helpers shared by the command-line tools.  Standard library only,
+so CLIs that keep OpenCV/networkx out of their parent process (batch_routes)
+can import it freely.
+
+Usage:
+    from cli_args import positive_float
+    parser.add_argument("--reach", type=positive_float)
+"""
+
+import argparse
+
+
+def positive_float(text):
+    """argparse type for a float greater than zero (e.g. --reach)"""
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {text}")
+    return value
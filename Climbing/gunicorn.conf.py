@@ -0,0 +1,26 @@
+"""
+gunicorn.conf.py
+----------------
+gunicorn settings for serving wsgi:app directly with the gunicorn command.
+
+gunicorn only reads server hooks such as post_fork from a config file, so
+``gunicorn --preload wsgi:app`` on its own never reopens the route store in
+the workers and every worker would share the SQLite connection the master
+opened.  This file applies the same settings as ``python wsgi.py``
+(including the CLIMB_* environment variables and the post_fork hook); flags
+given on the command line still override them.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+    gunicorn -c gunicorn.conf.py -w 4 --threads 8 -b 0.0.0.0:8000 wsgi:app
+"""
+
+import os
+import sys
+
+# gunicorn executes this file before it puts the app directory on sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import wsgi
+
+globals().update(wsgi.gunicorn_options())
@@ -0,0 +1,210 @@
+"""
+Hold Set
+--------
+Array-backed store for detected holds, shared by the analyzer and the
+backend pipeline.
+
+Holds used to be lists of dicts, which costs several hundred bytes per hold
+and makes every lookup by id a linear scan.  A HoldSet keeps one NumPy
+structured array row per hold (id, x, y, w, h, area plus colour, type and
+size as small integer codes) and an id -> row dict, so:
+- by_id() / index_of() are O(1)
+- x, y and xy are array views for vectorised maths
+- distances() / within() / nearest() answer spatial queries in one pass
+- to_dicts() gives back exactly the dicts (keys, key order and int/float
+  types) the set was built from, so the JSON APIs are unchanged
+- hold dicts (by_id, indexing, iteration) are built from the array when
+  asked for and never cached, so the set stays at the array's size
+
+Usage:
+    holds = HoldSet.from_dicts([{"id": 0, "x": 275, "y": 1050, "color": "blue"}, ...])
+    hold = holds.by_id(0)                 # {"id": 0, "x": 275, "y": 1050, "color": "blue"}
+    near = holds.within(400, 900, 150)    # ids of holds within 150 px
+    json.dump(holds.to_dicts(), f)
+"""
+
+import numpy as np
+
+NUMERIC_FIELDS = ("x", "y", "w", "h", "area")
+CATEGORY_FIELDS = ("color", "type", "size")
+MISSING = 65535  # category code for "field not set on this hold"
+
+HOLD_DTYPE = np.dtype(
+    [("id", np.int64)]
+    + [(name, np.float64) for name in NUMERIC_FIELDS]
+    + [(name, np.uint16) for name in CATEGORY_FIELDS]
+)
+
+
+class HoldSet:
+    def __init__(self, rows, categories, fields, int_fields=(), extra=None):
+        """Prefer HoldSet.from_dicts; rows is a HOLD_DTYPE array"""
+        self._rows = rows
+        self._categories = categories   # field -> list of labels, code = index
+        self.fields = list(fields)      # keys present on the original dicts, in order
+        self._int_fields = set(int_fields)
+        self._extra = extra or {}       # row -> {key: value} for keys outside the schema
+        self._index = {int(hold_id): row for row, hold_id in enumerate(rows["id"])}
+        if len(self._index) != len(rows):
+            raise ValueError("hold ids must be unique")
+
+    @classmethod
+    def from_dicts(cls, holds):
+        """Build a HoldSet from hold dicts (or return it unchanged if it already is one)"""
+        if isinstance(holds, HoldSet):
+            return holds
+        holds = list(holds)
+        rows = np.zeros(len(holds), dtype=HOLD_DTYPE)
+        for name in NUMERIC_FIELDS:
+            rows[name] = np.nan
+        for name in CATEGORY_FIELDS:
+            rows[name] = MISSING
+
+        fields = {}
+        categories = {name: [] for name in CATEGORY_FIELDS}
+        codes = {name: {} for name in CATEGORY_FIELDS}
+        float_fields = set()
+        extra = {}
+        for row, hold in enumerate(holds):
+            for key, value in hold.items():
+                fields.setdefault(key, None)
+                if key == "id":
+                    rows[row]["id"] = value
+                elif key in NUMERIC_FIELDS:
+                    rows[row][key] = value
+                    if not isinstance(value, (int, np.integer)):
+                        float_fields.add(key)
+                elif key in CATEGORY_FIELDS and isinstance(value, str):
+                    code = codes[key].get(value)
+                    if code is None:
+                        if len(categories[key]) >= MISSING:
+                            raise ValueError(f"more than {MISSING} distinct {key} labels")
+                        code = codes[key][value] = len(categories[key])
+                        categories[key].append(value)
+                    rows[row][key] = code
+                else:
+                    extra.setdefault(row, {})[key] = value
+        if "id" not in fields:
+            rows["id"] = np.arange(len(holds))
+
+        int_fields = {name for name in NUMERIC_FIELDS if name in fields and name not in float_fields}
+        return cls(rows, categories, fields, int_fields, extra)
+
+    # ---------------- dict view ----------------
+
+    def to_dicts(self):
+        """Holds as a list of plain dicts, as they were passed to from_dicts"""
+        return list(self._iter_dicts())
+
+    def _iter_dicts(self):
+        """Row dicts in order, built one at a time from per-column value lists"""
+        columns = {}
+        for key in self.fields:
+            if key == "id":
+                columns[key] = self._rows["id"].tolist()
+            elif key in NUMERIC_FIELDS:
+                values = self._rows[key].tolist()
+                if key in self._int_fields:
+                    values = [v if v != v else int(v) for v in values]  # v != v: NaN
+                columns[key] = values
+            elif key in CATEGORY_FIELDS:
+                labels = self._categories[key]
+                columns[key] = [labels[c] if c != MISSING else None for c in self._rows[key].tolist()]
+
+        for row in range(len(self._rows)):
+            extra = self._extra.get(row, {})
+            hold = {}
+            for key in self.fields:
+                if key in columns:
+                    value = columns[key][row]
+                    if value is None or value != value:  # not set on this hold
+                        if key in extra:
+                            hold[key] = extra[key]
+                        continue
+                    hold[key] = value
+                elif key in extra:
+                    hold[key] = extra[key]
+            yield hold
+
+    def _row_dict(self, row):
+        """Dict for one row, built from the array on demand (nothing is cached,
+        so the set stays at its array size however it is accessed)"""
+        values = dict(zip(HOLD_DTYPE.names, self._rows[row].item()))
+        extra = self._extra.get(row, {})
+        hold = {}
+        for key in self.fields:
+            if key in values:
+                value = values[key]
+                if key in CATEGORY_FIELDS:
+                    value = self._categories[key][value] if value != MISSING else None
+                elif key in self._int_fields and value == value:  # value == value: not NaN
+                    value = int(value)
+                if value is None or value != value:  # not set on this hold
+                    if key in extra:
+                        hold[key] = extra[key]
+                    continue
+                hold[key] = value
+            elif key in extra:
+                hold[key] = extra[key]
+        return hold
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        """Hold dicts in row order, built one at a time"""
+        return self._iter_dicts()
+
+    def __getitem__(self, row):
+        """Hold dict at row position ``row`` (use by_id for lookups by id)"""
+        if not -len(self._rows) <= row < len(self._rows):
+            raise IndexError("hold row out of range")
+        return self._row_dict(row % len(self._rows))
+
+    def __contains__(self, hold_id):
+        return hold_id in self._index
+
+    def index_of(self, hold_id):
+        """Row position of a hold id; raises KeyError if unknown"""
+        return self._index[hold_id]
+
+    def by_id(self, hold_id):
+        """Hold dict for an id in O(1); raises KeyError if unknown"""
+        return self[self._index[hold_id]]
+
+    # ---------------- array views / queries ----------------
+
+    @property
+    def ids(self):
+        return self._rows["id"]
+
+    @property
+    def x(self):
+        return self._rows["x"]
+
+    @property
+    def y(self):
+        return self._rows["y"]
+
+    @property
+    def xy(self):
+        """(n, 2) array of hold centres"""
+        return np.column_stack((self._rows["x"], self._rows["y"]))
+
+    @property
+    def nbytes(self):
+        return self._rows.nbytes
+
+    def distances(self, x, y):
+        """Distance from (x, y) to every hold, in row order"""
+        return np.hypot(self._rows["x"] - x, self._rows["y"] - y)
+
+    def within(self, x, y, radius):
+        """Ids of the holds within ``radius`` pixels of (x, y)"""
+        return self._rows["id"][self.distances(x, y) <= radius]
+
+    def nearest(self, x, y):
+        """Id of the hold closest to (x, y), or None for an empty set"""
+        if not len(self._rows):
+            return None
+        return int(self._rows["id"][np.argmin(self.distances(x, y))])
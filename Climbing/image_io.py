@@ -0,0 +1,39 @@
+"""
+Image I/O
+---------
+One entry point for getting a decoded image into the pipelines.
+
+``load_image`` accepts any of:
+- a file path (str or os.PathLike) - read with cv2.imread
+- encoded image bytes (bytes, bytearray, memoryview) - decoded in memory
+  with cv2.imdecode, no temporary file needed
+- an already decoded BGR ndarray - returned unchanged
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+
+def load_image(source):
+    """Return a BGR ndarray for a path, encoded bytes or ndarray"""
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return decode_image(source)
+    if isinstance(source, (str, os.PathLike)):
+        img = cv2.imread(os.fspath(source))
+        if img is None:
+            raise ValueError(f"Could not read image at {source}")
+        return img
+    raise TypeError(f"Unsupported image source: {type(source).__name__}")
+
+
+def decode_image(data):
+    """Decode encoded image bytes (JPEG, PNG, ...) straight from memory"""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    img = cv2.imdecode(buf, cv2.IMREAD_COLOR) if buf.size else None
+    if img is None:
+        raise ValueError("Could not decode image data")
+    return img
@@ -0,0 +1,158 @@
+"""
+Job Queue
+---------
+A small in-process job broker that runs CPU-heavy analysis on a bounded
+process pool, so request threads only enqueue work and return a job id.
+
+- submit() returns a job id immediately, or raises QueueFull once
+  max_pending jobs are queued or running (callers answer 429)
+- status() reports queued / running / done / failed for a job id
+- result() returns the finished value (or re-raises the job's error)
+- finished jobs are kept for lookups up to keep_finished entries
+- workers start from a fork server (start_method), and a pool broken by a
+  crashed worker is replaced on the next submit()
+
+Usage:
+    jobs = JobQueue(max_workers=4, max_pending=16)
+    job_id = jobs.submit(analyze_to_route_json, image_bytes, "wall.jpg")
+    jobs.status(job_id)   # {"id": ..., "status": "running", ...}
+    jobs.result(job_id)   # once status is "done"
+"""
+
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_pending jobs are already in flight"""
+
+
+class JobQueue:
+    def __init__(self, max_workers=None, max_pending=16, keep_finished=256, initializer=None,
+                 start_method="forkserver"):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.initializer = initializer  # run once in each worker process, e.g. to preload modules
+        self.start_method = start_method  # multiprocessing start method of the worker processes
+        self._executor = None  # created on first submit, not at import time
+        self._jobs = OrderedDict()  # job id -> {"future", "submitted", "finished"}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "pool_restarts": 0}
+
+    def submit(self, fn, *args, on_done=None):
+        """Queue fn(*args) on the process pool and return its job id
+
+        on_done(result) is called in the parent process when the job succeeds.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"{self._pending} jobs already pending")
+            job_id = uuid.uuid4().hex
+            future = self._submit(fn, args)
+            self._jobs[job_id] = {"future": future, "submitted": time.time(), "finished": None}
+            self._pending += 1
+            self.stats["submitted"] += 1
+
+        future.add_done_callback(lambda f: self._finish(job_id, f, on_done))
+        return job_id
+
+    def completed(self, result):
+        """Register an already available result (e.g. a cache hit) as a done job"""
+        future = Future()
+        future.set_result(result)
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {"future": future, "submitted": time.time(), "finished": time.time()}
+            self.stats["submitted"] += 1
+            self.stats["completed"] += 1
+            self._trim()
+        return job_id
+
+    def status(self, job_id):
+        """Status dict for a job, or None if the id is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job["future"]
+        if not future.done():
+            state = "running" if future.running() else "queued"
+        elif future.cancelled() or future.exception() is not None:
+            state = "failed"
+        else:
+            state = "done"
+
+        info = {"id": job_id, "status": state, "submitted": job["submitted"]}
+        if job["finished"] is not None:
+            info["finished"] = job["finished"]
+        if state == "failed":
+            info["error"] = "cancelled" if future.cancelled() else str(future.exception())
+        return info
+
+    def result(self, job_id):
+        """Finished value of a job; raises KeyError if unknown, the job's error if it failed"""
+        with self._lock:
+            job = self._jobs[job_id]
+        return job["future"].result(timeout=0)
+
+    def depth(self):
+        """Number of jobs queued or running"""
+        with self._lock:
+            return self._pending
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _new_executor(self):
+        # Imported here: multiprocessing is not needed until the first job
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Workers come from a fork server rather than a fork of this (threaded)
+        # process, which can deadlock on locks held by other threads
+        context = multiprocessing.get_context(self.start_method)
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                   initializer=self.initializer)
+
+    def _submit(self, fn, args):
+        """Submit to the pool (lock held), replacing a pool that a crashed worker broke"""
+        from concurrent.futures.process import BrokenProcessPool
+
+        if self._executor is None:
+            self._executor = self._new_executor()
+        try:
+            return self._executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill, segfault in native code): the pool
+            # rejects all further work, so start a fresh one
+            self.stats["pool_restarts"] += 1
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            return self._executor.submit(fn, *args)
+
+    def _finish(self, job_id, future, on_done):
+        failed = future.cancelled() or future.exception() is not None
+        with self._lock:
+            self._pending -= 1
+            self._jobs[job_id]["finished"] = time.time()
+            self.stats["failed" if failed else "completed"] += 1
+            self._trim()
+        if not failed and on_done is not None:
+            on_done(future.result())
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond keep_finished (lock held)"""
+        finished = [jid for jid, job in self._jobs.items() if job["finished"] is not None]
+        for jid in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[jid]
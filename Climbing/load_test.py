@@ -0,0 +1,180 @@
+"""load_test.py
+Local load-test harness for a running server.
+
+Replays recorded /analyze payloads at a fixed concurrency and reports the
+latency percentiles (p50/p95/p99) and throughput.  Payloads come from a
+JSONL file, one JSON body per line, exactly as a client would POST it:
+
+    {"useDemo": true}
+    {"useDemo": true, "k": 3}
+    {"image": "data:image/jpeg;base64,/9j/4AAQ...", "k": 2}
+
+Two extra keys are read by the harness rather than sent:
+- "image_file": path of an image to send base64-encoded as "image", so
+  recordings need not embed large photos (relative to the JSONL file)
+- "endpoint": path to POST to instead of /analyze (e.g. /jobs)
+
+Payloads are replayed round-robin until --requests have been sent.  The
+first --warmup requests are not counted, so cold caches and lazy imports do
+not skew the numbers.  Only the standard library is used.
+
+Usage:
+    python wsgi.py --workers 4 &
+    python load_test.py payloads.jsonl --url http://localhost:8000 --concurrency 16 --requests 500
+    python load_test.py --demo --concurrency 8 --out load.json
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_URL = "http://localhost:8000"
+DEFAULT_ENDPOINT = "/analyze"
+REQUEST_TIMEOUT = 300  # seconds per request before it counts as an error
+
+
+def load_payloads(path):
+    """[(endpoint, body bytes)] from a JSONL file of recorded payloads"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    payloads = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                payload = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f"{path}:{line_no}: {exc}")
+            endpoint = payload.pop("endpoint", DEFAULT_ENDPOINT)
+            image_file = payload.pop("image_file", None)
+            if image_file:
+                with open(os.path.join(base_dir, image_file), "rb") as img:
+                    payload["image"] = base64.b64encode(img.read()).decode("ascii")
+            payloads.append((endpoint, json.dumps(payload).encode()))
+    return payloads
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # ceil(n * pct / 100)
+    return sorted_values[int(rank) - 1]
+
+
+def send(url, body):
+    """POST body; returns (status, seconds, response bytes)"""
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+            data = response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        data = exc.read()
+        status = exc.code
+    except (urllib.error.URLError, OSError) as exc:
+        return f"error: {getattr(exc, 'reason', exc)}", time.perf_counter() - start, 0
+    return status, time.perf_counter() - start, len(data)
+
+
+def run_load(base_url, payloads, concurrency, requests, warmup=0):
+    """Replay payloads with `concurrency` requests in flight; returns the report dict"""
+    base_url = base_url.rstrip("/")
+    counter = iter(range(warmup + requests))
+    counter_lock = threading.Lock()
+    results = []  # (status, seconds, bytes) of the measured requests
+    measure_start = [None]
+
+    def worker():
+        while True:
+            with counter_lock:
+                n = next(counter, None)
+                if n == warmup and measure_start[0] is None:
+                    measure_start[0] = time.perf_counter()
+            if n is None:
+                return
+            endpoint, body = payloads[n % len(payloads)]
+            result = send(base_url + endpoint, body)
+            if n >= warmup:
+                results.append(result)
+
+    if warmup:
+        print(f"Warming up with {warmup} requests...")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - (measure_start[0] or time.perf_counter())
+
+    statuses = {}
+    for status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = sorted(seconds for status, seconds, _ in results if status == 200)
+    report = {
+        "url": base_url,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "statuses": statuses,
+        "errors": len(results) - len(ok),
+        "seconds": elapsed,
+        "throughput_rps": len(results) / elapsed if elapsed else 0.0,
+        "bytes_received": sum(size for _, _, size in results),
+    }
+    # Latencies cover successful (200) responses only
+    for name, pct in (("p50", 50), ("p95", 95), ("p99", 99)):
+        value = percentile(ok, pct)
+        report[f"{name}_ms"] = value * 1000 if value is not None else None
+    report["mean_ms"] = sum(ok) / len(ok) * 1000 if ok else None
+    report["max_ms"] = ok[-1] * 1000 if ok else None
+    return report
+
+
+def print_report(report):
+    def ms(value):
+        return f"{value:.1f} ms" if value is not None else "-"
+
+    print(f"{report['requests']} requests to {report['url']} at concurrency {report['concurrency']} "
+          f"in {report['seconds']:.2f}s")
+    print(f"  throughput  {report['throughput_rps']:.1f} req/s")
+    print(f"  p50 {ms(report['p50_ms'])}   p95 {ms(report['p95_ms'])}   p99 {ms(report['p99_ms'])}   "
+          f"mean {ms(report['mean_ms'])}   max {ms(report['max_ms'])}")
+    print("  statuses    " + ", ".join(f"{status}: {n}" for status, n in sorted(report["statuses"].items())))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay recorded /analyze payloads against a running server")
+    parser.add_argument("payloads", nargs="?", default=None, help="JSONL file of request payloads")
+    parser.add_argument("--demo", action="store_true", help="Replay {\"useDemo\": true} instead of a file")
+    parser.add_argument("--url", default=DEFAULT_URL, help="Server base URL")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests to send")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests sent first")
+    parser.add_argument("--out", default=None, help="Optional JSON file for the report")
+    args = parser.parse_args()
+
+    if args.demo:
+        payloads = [(DEFAULT_ENDPOINT, json.dumps({"useDemo": True}).encode())]
+    elif args.payloads:
+        payloads = load_payloads(args.payloads)
+    else:
+        parser.error("give a payloads file or --demo")
+    if not payloads:
+        raise SystemExit("No payloads to replay")
+
+    report = run_load(args.url, payloads, max(1, args.concurrency), max(1, args.requests), max(0, args.warmup))
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.out}")
+    if report["errors"]:
+        sys.exit(1)
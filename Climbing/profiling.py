@@ -0,0 +1,120 @@
+"""profiling.py
+Offline profiling support for the command-line entry points (--profile).
+
+While enabled, a Profiler:
+- runs cProfile for a per-function CPU profile (saved as <prefix>.pstats)
+- samples the main thread's stack every few milliseconds and writes the
+  samples in the collapsed-stack format ("a;b;c count") to <prefix>.collapsed,
+  ready for flamegraph.pl, speedscope or inferno
+- measures the peak traced memory of each stage with tracemalloc
+
+When disabled every method is a no-op, so CLIs can wrap their stages
+unconditionally.
+
+Usage:
+    prof = Profiler("route_profile", enabled=args.profile)
+    with prof:
+        with prof.stage("detect"):
+            holds = color_based_hold_detection(path)
+        with prof.stage("plan"):
+            ...
+    prof.report()
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+SAMPLE_INTERVAL = 0.002  # seconds between stack samples
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class Profiler:
+    def __init__(self, prefix="profile", enabled=True, interval=SAMPLE_INTERVAL):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.interval = interval
+        self.stages = []  # (name, seconds, peak bytes)
+        self.samples = Counter()
+        self._cprofile = None
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        tracemalloc.start()
+        self._target = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if not self.enabled:
+            return False
+        self._cprofile.disable()
+        self._stop.set()
+        self._sampler.join()
+        tracemalloc.stop()
+        self._write()
+        return False
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage and record its peak traced memory"""
+        if not self.enabled:
+            yield
+            return
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            self.stages.append((name, elapsed, max(0, peak - base)))
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def _write(self):
+        self._cprofile.dump_stats(f"{self.prefix}.pstats")
+        with open(f"{self.prefix}.collapsed", "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def report(self, top=15, stream=None):
+        """Print per-stage time/peak memory and the top functions by cumulative time"""
+        if not self.enabled:
+            return
+        stream = stream or sys.stdout
+        print("\nProfile by stage:", file=stream)
+        print(f"  {'stage':<20}{'time (ms)':>12}{'peak mem (KiB)':>16}", file=stream)
+        for name, seconds, peak in self.stages:
+            print(f"  {name:<20}{seconds * 1000:>12.2f}{peak / 1024:>16.1f}", file=stream)
+
+        print(f"\nTop {top} functions by cumulative time:", file=stream)
+        stats = pstats.Stats(f"{self.prefix}.pstats", stream=stream)
+        stats.sort_stats("cumulative").print_stats(top)
+        print(f"CPU profile saved to {self.prefix}.pstats, "
+              f"{sum(self.samples.values())} stack samples saved to {self.prefix}.collapsed", file=stream)
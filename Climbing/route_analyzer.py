@@ -16,7 +16,7 @@ Usage:
    - Upload your own climbing wall images to analyze them
 
 2. To use from the command line:
-   python route_analyzer.py [output_file.json]
+   python route_analyzer.py [output_file.json] [--profile PREFIX]
 
 3. To use as a library in your own code:
    from route_analyzer import ClimbingRouteAnalyzer
@@ -27,10 +27,30 @@ Usage:
 import os
 import json
 import math
+import time
 import random
 
+# Limb-assignment cost model, in image pixels (~270 px per metre on the demo wall)
+LIMBS = ("left_hand", "right_hand", "left_foot", "right_foot")
+MAX_ARM_SPAN = 450           # hand to hand
+MAX_LEG_SPAN = 350           # foot to foot
+MAX_BODY_SPAN = 600          # any hand to any foot
+GROUND_OFFSET = 150          # feet start on the ground this far below the first hold
+FOOT_SPACING = 100           # horizontal gap between the feet on the ground
+SPREAD_WEIGHT = 1.5          # cost per pixel of hand/foot spread after a move
+FOOT_ABOVE_HAND_PENALTY = 400
+HAND_BELOW_FOOT_PENALTY = 400
+CROSS_PENALTY = 150          # left limb ending up right of its partner
+CROSS_MARGIN = 20
+INFEASIBLE_PENALTY = 10000   # used only when no placement satisfies the spans
+MAX_LIMB_STATES = 500        # frontier cap; the search is exact below it
+
 class ClimbingRouteAnalyzer:
-    def __init__(self):
+    def __init__(self, wall_index=None):
+        # Optional wall_index.WallIndex used to recognise previously analysed walls
+        self.wall_index = wall_index
+        # Seconds spent in each stage of the last analysis
+        self.timings = {}
         self.holds = []
         self.route = []
         self.route_with_limbs = []
@@ -42,6 +62,16 @@ class ClimbingRouteAnalyzer:
             "center_x": 0,
             "center_y": 0
         }
+
+    @property
+    def holds(self):
+        """The wall's holds as a HoldSet; assigning a list of dicts converts it"""
+        return self._holds
+
+    @holds.setter
+    def holds(self, holds):
+        from hold_set import HoldSet  # NumPy loads on first use, not at import
+        self._holds = HoldSet.from_dicts(holds)
     
     def identify_holds_from_image(self, img_path=None):
         """
@@ -82,10 +112,48 @@ class ClimbingRouteAnalyzer:
         route_ids = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
         
         # Convert to route steps
-        self.route = []
+        self.route = self._route_steps(route_ids)
+        
+        return self.route
+
+    def plan_alternative_routes(self, k=3):
+        """
+        Up to k routes over the holds as
+        [{"rank", "cost", "main", "route": [route steps]}], cheapest first
+
+        The candidates are the cheapest routes found by the backend's
+        k-shortest-path search on its reach-bounded hold graph, plus the main
+        route (self.route, planned if needed), which is always listed and is
+        the one with "main": true, i.e. the route the instructions describe.
+        All costs use the backend's move_cost and ranks follow the cost, so
+        the main route is not necessarily rank 1.
+        """
+        from route_planner_backend import build_route_graph, find_optimal_routes, move_cost
+
+        if not self.route:
+            self.plan_route()
+        main_ids = [step["hold_id"] for step in self.route]
+        main_cost = float(sum(move_cost(self.holds.by_id(a), self.holds.by_id(b))
+                              for a, b in zip(main_ids, main_ids[1:])))
+        routes = [{"cost": main_cost, "main": True, "route": [dict(step) for step in self.route]}]
+
+        G = build_route_graph(self.holds)
+        # k candidates leave k - 1 others even if the search also finds the main route
+        for r in find_optimal_routes(G, k):
+            if len(routes) == k:
+                break
+            if r["route"] != main_ids:
+                routes.append({"cost": r["cost"], "main": False, "route": self._route_steps(r["route"])})
+
+        routes.sort(key=lambda r: r["cost"])  # stable: the main route goes first on a tie
+        return [{"rank": rank, **r} for rank, r in enumerate(routes, start=1)]
+
+    def _route_steps(self, route_ids):
+        """Route step dicts for a sequence of hold ids"""
+        steps = []
         for idx, hold_id in enumerate(route_ids):
-            hold = next(h for h in self.holds if h["id"] == hold_id)
-            self.route.append({
+            hold = self.holds.by_id(hold_id)
+            steps.append({
                 "step": idx + 1,
                 "hold_id": hold["id"],
                 "x": hold["x"],
@@ -94,8 +162,7 @@ class ClimbingRouteAnalyzer:
                 "size": hold["size"],
                 "type": hold["type"]
             })
-        
-        return self.route
+        return steps
     
     def distance(self, x1, y1, x2, y2):
         """Calculate distance between two points"""
@@ -113,124 +180,160 @@ class ClimbingRouteAnalyzer:
         if not limbs:
             return 400, 1100  # Default position at the bottom center
             
-        x_sum = sum(self.holds[limb]["x"] for limb in limbs)
-        y_sum = sum(self.holds[limb]["y"] for limb in limbs)
-        
-        return x_sum / len(limbs), y_sum / len(limbs)
+        rows = [self.holds.index_of(limb) for limb in limbs]
+        return float(self.holds.x[rows].mean()), float(self.holds.y[rows].mean())
     
     def suggest_limb_placements(self):
-        """Suggest which limb should be used for each hold in the route"""
+        """
+        Suggest which limb should be used for each hold in the route
+
+        The climber starts with the left then right hand on the first two
+        holds and feet on the ground.  Every later hold is taken by one limb,
+        and the sequence minimising the total cost (distance travelled by the
+        moving limb plus hand/foot spread, with penalties for feet above hands,
+        hands below feet and crossed limbs) is found exactly by dynamic
+        programming over the (LH, RH, LF, RF) states.  States whose limbs are
+        further apart than the arm, leg or body span are pruned, which keeps
+        the frontier to the few holds within reach of the newest one.  On very
+        dense routes the frontier is capped at MAX_LIMB_STATES cheapest states,
+        so the run time stays linear in the route length.
+        """
         self.route_with_limbs = []
-        
-        # Initialize climber's position at the start
-        # Assuming we start with feet on the ground and hands on the first holds
-        if len(self.route) >= 2:
-            self.body_position = {
-                "left_hand": self.route[0]["hold_id"],
-                "right_hand": None,
-                "left_foot": None,  # On the ground
-                "right_foot": None,  # On the ground
-                "center_x": self.route[0]["x"],
-                "center_y": self.route[0]["y"] + 100  # Body is below the first hold
-            }
-        else:
+        if len(self.route) < 2:
             return []
-            
-        # First step - placing first hand
-        first_step = self.route[0].copy()
-        first_step["limb"] = "left_hand"
-        first_step["movement"] = "Start with left hand on the first hold"
-        first_step["body_position"] = "Standing at the base, reach up with left hand"
-        self.route_with_limbs.append(first_step)
-        
-        # Second step - placing second hand
-        if len(self.route) >= 2:
-            second_step = self.route[1].copy()
-            second_step["limb"] = "right_hand"
-            second_step["movement"] = "Place right hand on the next hold"
-            second_step["body_position"] = "Weight balanced between both arms, feet on starting holds or features"
-            self.body_position["right_hand"] = self.route[1]["hold_id"]
-            self.route_with_limbs.append(second_step)
-        
-        # For the rest of the route, alternate limbs logically
-        for i in range(2, len(self.route)):
-            current_hold = self.route[i]
-            step = current_hold.copy()
-            
-            # Calculate body center position
-            center_x, center_y = self.calculate_body_center()
-            
-            # Decide which limb to use next
-            # Logic: Use the limb that's furthest from the next hold
-            limb_distances = {
-                "left_hand": float('inf') if self.body_position["left_hand"] is None else 
-                              self.distance(self.holds[self.body_position["left_hand"]]["x"], 
-                                           self.holds[self.body_position["left_hand"]]["y"],
-                                           current_hold["x"], current_hold["y"]),
-                "right_hand": float('inf') if self.body_position["right_hand"] is None else 
-                               self.distance(self.holds[self.body_position["right_hand"]]["x"], 
-                                            self.holds[self.body_position["right_hand"]]["y"],
-                                            current_hold["x"], current_hold["y"]),
-                "left_foot": float('inf') if self.body_position["left_foot"] is None else 
-                              self.distance(self.holds[self.body_position["left_foot"]]["x"], 
-                                           self.holds[self.body_position["left_foot"]]["y"],
-                                           current_hold["x"], current_hold["y"]),
-                "right_foot": float('inf') if self.body_position["right_foot"] is None else 
-                               self.distance(self.holds[self.body_position["right_foot"]]["x"], 
-                                            self.holds[self.body_position["right_foot"]]["y"],
-                                            current_hold["x"], current_hold["y"])
-            }
-            
-            # Consider hold height to bias toward using hands for higher holds and feet for lower ones
-            height_factor = (1200 - current_hold["y"]) / 1200  # 0 at bottom, 1 at top
-            
-            # Adjust distances based on height - prefer hands for high holds, feet for low holds
-            if height_factor > 0.5:  # Higher hold - prefer hands
-                limb_distances["left_foot"] *= 1.5
-                limb_distances["right_foot"] *= 1.5
-            else:  # Lower hold - prefer feet
-                limb_distances["left_hand"] *= 1.5
-                limb_distances["right_hand"] *= 1.5
-            
-            # Select the limb with the maximum distance (the one that needs to move most)
-            next_limb = max(limb_distances, key=limb_distances.get)
-            
-            # Update limb position
-            self.body_position[next_limb] = current_hold["hold_id"]
-            
-            # Generate explanation
-            if next_limb.endswith("hand"):
-                movement = f"Move {next_limb.replace('_', ' ')} to the {current_hold['color']} {current_hold['type']}"
-            else:
-                movement = f"Place {next_limb.replace('_', ' ')} on the {current_hold['color']} {current_hold['type']}"
-            
-            # Give detailed body position advice
-            if next_limb.endswith("hand"):
-                body_position = "Keep your center of gravity beneath your handholds. "
-                if current_hold["type"] == "crimp":
-                    body_position += "Crimp carefully with straight fingers."
-                elif current_hold["type"] == "pinch":
-                    body_position += "Apply opposing thumb pressure on this pinch."
-                elif current_hold["type"] == "sloper":
-                    body_position += "Use open hand technique and keep weight beneath the hold."
-                elif current_hold["type"] == "jug":
-                    body_position += "Full grip with fingers wrapped around the jug."
-            else:
-                body_position = "Shift your weight as you move your foot. "
-                if i < len(self.route) - 1:
-                    next_hold = self.route[i+1]
-                    if next_hold["x"] > current_hold["x"]:
-                        body_position += "Prepare to move right next."
-                    else:
-                        body_position += "Prepare to move left next."
-            
-            step["limb"] = next_limb
-            step["movement"] = movement
-            step["body_position"] = body_position
-            
+
+        limbs = self._optimal_limb_sequence()
+
+        for i, step in enumerate(self.route):
+            step = step.copy()
+            step["limb"] = LIMBS[limbs[i]]
+            step["movement"], step["body_position"] = self._describe_step(i, step["limb"])
             self.route_with_limbs.append(step)
-        
+
+        # Final resting position of every limb
+        for limb_idx, limb in enumerate(LIMBS):
+            last = [i for i, l in enumerate(limbs) if l == limb_idx]
+            self.body_position[limb] = self.route[last[-1]]["hold_id"] if last else None
+        self.body_position["center_x"], self.body_position["center_y"] = self.calculate_body_center()
+
         return self.route_with_limbs
+
+    def _optimal_limb_sequence(self):
+        """Minimum-cost limb index (into LIMBS) for every route step
+
+        The frontier of (LH, RH, LF, RF) states is kept as NumPy arrays and
+        each step scores all states x 4 limbs at once: the distances from the
+        new hold to every route hold (and the feet's ground spots) are
+        computed once per step and looked up by index, instead of per state.
+        """
+        import numpy as np  # loaded on first use, like HoldSet
+
+        n = len(self.route)
+        x0, y0 = self.route[0]["x"], self.route[0]["y"]
+        # Rows 0..n-1 are the route holds, n and n + 1 the left / right foot on the ground
+        points = np.array([(step["x"], step["y"]) for step in self.route]
+                          + [(x0 - FOOT_SPACING / 2, y0 + GROUND_OFFSET),
+                             (x0 + FOOT_SPACING / 2, y0 + GROUND_OFFSET)], dtype=float)
+        xs, ys = points[:, 0], points[:, 1]
+        base = n + 2  # states are encoded as one integer in base n + 2 for de-duplication
+
+        # Steps 1 and 2: left then right hand on the starting holds
+        states = np.array([[0, 1, n, n + 1]])
+        costs = np.zeros(1)
+        back = [None, None]  # per step: (parent row, limb) of each frontier state
+
+        for i in range(2, n):
+            d = np.hypot(xs - xs[i], ys - ys[i])  # hold i to every hold and ground spot
+            lh, rh, lf, rf = states.T
+            arm = np.hypot(xs[lh] - xs[rh], ys[lh] - ys[rh])
+            leg = np.hypot(xs[lf] - xs[rf], ys[lf] - ys[rf])
+
+            # Column `limb` of each (states x 4 limbs) array: move that limb to hold i
+            new_arm = np.column_stack((d[rh], d[lh], arm, arm))
+            new_leg = np.column_stack((leg, leg, d[rf], d[lf]))
+            # Only spans involving the moved limb can have changed
+            body = np.column_stack((np.maximum(d[lf], d[rf]), np.maximum(d[lf], d[rf]),
+                                    np.maximum(d[lh], d[rh]), np.maximum(d[lh], d[rh])))
+            feasible = (new_arm <= MAX_ARM_SPAN) & (new_leg <= MAX_LEG_SPAN) & (body <= MAX_BODY_SPAN)
+
+            step = d[states] + SPREAD_WEIGHT * (new_arm + new_leg)
+            step[:, :2] += np.where(ys[i] > np.maximum(ys[lf], ys[rf]), HAND_BELOW_FOOT_PENALTY, 0)[:, None]
+            step[:, 2:] += np.where(ys[i] < np.minimum(ys[lh], ys[rh]), FOOT_ABOVE_HAND_PENALTY, 0)[:, None]
+            # Crossed hands / feet after each move
+            hands_crossed = np.column_stack((xs[i] > xs[rh] + CROSS_MARGIN, xs[lh] > xs[i] + CROSS_MARGIN,
+                                             xs[lh] > xs[rh] + CROSS_MARGIN, xs[lh] > xs[rh] + CROSS_MARGIN))
+            feet_crossed = np.column_stack((xs[lf] > xs[rf] + CROSS_MARGIN, xs[lf] > xs[rf] + CROSS_MARGIN,
+                                            xs[i] > xs[rf] + CROSS_MARGIN, xs[lf] > xs[i] + CROSS_MARGIN))
+            step += CROSS_PENALTY * (hands_crossed.astype(float) + feet_crossed)
+
+            total = (costs[:, None] + step).ravel()  # state-major, limb-minor
+            if feasible.any():
+                keep = np.flatnonzero(feasible.ravel())
+            else:
+                # Relax the span limits only if nothing is reachable
+                keep = np.arange(total.size)
+                total = total + INFEASIBLE_PENALTY
+            parent, limb = np.divmod(keep, 4)
+            total = total[keep]
+            new_states = states[parent].copy()
+            new_states[np.arange(keep.size), limb] = i
+
+            # Several moves can reach the same state: keep the cheapest of each
+            keys = ((new_states[:, 0] * base + new_states[:, 1]) * base + new_states[:, 2]) * base + new_states[:, 3]
+            order = np.lexsort((total, keys))
+            first = order[np.r_[True, keys[order][1:] != keys[order][:-1]]]
+            if first.size > MAX_LIMB_STATES:
+                # Very dense routes: keep only the cheapest states
+                first = first[np.argpartition(total[first], MAX_LIMB_STATES)[:MAX_LIMB_STATES]]
+            states, costs = new_states[first], total[first]
+            back.append((parent[first], limb[first]))
+
+        # Walk the back-pointers from the cheapest final state
+        sequence = [0, 1] + [None] * (n - 2)
+        row = int(np.argmin(costs))
+        for i in range(n - 1, 1, -1):
+            parent, limb = back[i]
+            sequence[i] = int(limb[row])
+            row = int(parent[row])
+        return sequence
+
+    def _describe_step(self, i, limb):
+        """Movement and body position advice for placing limb on route step i"""
+        current_hold = self.route[i]
+        if i == 0:
+            return (f"Start with {limb.replace('_', ' ')} on the first hold",
+                    f"Standing at the base, reach up with {limb.replace('_', ' ')}")
+        if i == 1:
+            return (f"Place {limb.replace('_', ' ')} on the next hold",
+                    "Weight balanced between both arms, feet on starting holds or features")
+
+        # Generate explanation
+        if limb.endswith("hand"):
+            movement = f"Move {limb.replace('_', ' ')} to the {current_hold['color']} {current_hold['type']}"
+        else:
+            movement = f"Place {limb.replace('_', ' ')} on the {current_hold['color']} {current_hold['type']}"
+        
+        # Give detailed body position advice
+        if limb.endswith("hand"):
+            body_position = "Keep your center of gravity beneath your handholds. "
+            if current_hold["type"] == "crimp":
+                body_position += "Crimp carefully with straight fingers."
+            elif current_hold["type"] == "pinch":
+                body_position += "Apply opposing thumb pressure on this pinch."
+            elif current_hold["type"] == "sloper":
+                body_position += "Use open hand technique and keep weight beneath the hold."
+            elif current_hold["type"] == "jug":
+                body_position += "Full grip with fingers wrapped around the jug."
+        else:
+            body_position = "Shift your weight as you move your foot. "
+            if i < len(self.route) - 1:
+                next_hold = self.route[i+1]
+                if next_hold["x"] > current_hold["x"]:
+                    body_position += "Prepare to move right next."
+                else:
+                    body_position += "Prepare to move left next."
+        
+        return movement, body_position
     
     def generate_route_instructions(self):
         """Generate detailed route instructions with limb placements"""
@@ -259,11 +362,66 @@ class ClimbingRouteAnalyzer:
         return instructions
     
     def analyze_image_and_generate_route(self, img_path=None):
-        """Complete pipeline from image to route instructions"""
-        self.identify_holds_from_image(img_path)
-        self.plan_route()
-        self.suggest_limb_placements()
-        return self.generate_route_instructions()
+        """Complete pipeline from image to route instructions
+
+        img_path may be a file path, encoded image bytes or a decoded ndarray.
+        """
+        for stage, result in self.analyze_image_in_stages(img_path):
+            pass
+        return result
+    
+    def analyze_image_in_stages(self, img_path=None):
+        """
+        Run the pipeline as a generator, yielding (stage, result) as each
+        stage finishes so callers can show partial results early:
+        ("holds", holds), ("route", route), ("instructions", instructions)
+
+        Time spent in each stage is recorded in self.timings.
+        """
+        self.timings = {}
+        start = time.perf_counter()
+        entry = None
+        if self.wall_index is not None and img_path is not None:
+            # Near-duplicate photo of a known wall: reuse its holds and any
+            # stage results already computed for them
+            from image_io import load_image
+            img = load_image(img_path)
+            self.timings["decode"] = time.perf_counter() - start
+            start = time.perf_counter()
+            entry = self.wall_index.match(img)
+            if entry is None:
+                self.identify_holds_from_image(img_path)
+                entry = self.wall_index.add(img, self.holds)
+            else:
+                self.holds = entry.holds
+        else:
+            self.identify_holds_from_image(img_path)
+        self.timings["detect"] = time.perf_counter() - start
+        yield "holds", self.holds
+
+        start = time.perf_counter()
+        if entry is not None and "route" in entry.stages:
+            self.route = [dict(s) for s in entry.stages["route"]]
+        else:
+            self.plan_route()
+            if entry is not None:
+                entry.stages["route"] = [dict(s) for s in self.route]
+        self.timings["plan"] = time.perf_counter() - start
+        yield "route", self.route
+
+        start = time.perf_counter()
+        if entry is not None and "route_with_limbs" in entry.stages:
+            self.route_with_limbs = [dict(s) for s in entry.stages["route_with_limbs"]]
+        else:
+            self.suggest_limb_placements()
+            if entry is not None:
+                entry.stages["route_with_limbs"] = [dict(s) for s in self.route_with_limbs]
+        self.timings["limbs"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        instructions = self.generate_route_instructions()
+        self.timings["instructions"] = time.perf_counter() - start
+        yield "instructions", instructions
     
     def save_route_to_json(self, output_file="climbing_route.json"):
         """Save the route with instructions to a JSON file"""
@@ -278,7 +436,7 @@ class ClimbingRouteAnalyzer:
                 "difficulty": "intermediate",
                 "image": "climbing_wall.jpg"
             },
-            "holds": self.holds,
+            "holds": self.holds.to_dicts(),
             "instructions": instructions
         }
         
@@ -287,6 +445,46 @@ class ClimbingRouteAnalyzer:
             
         return output_file
 
+def analyze_to_route_json(image=None, image_name="demo_image", wall_index=None, timings=None, k=1):
+    """Run the full pipeline on an image (path, bytes, ndarray or None for the
+    demo) and return the route JSON served by the web API.
+
+    If a timings dict is given, per-stage seconds are added to it.  With
+    k > 1 the JSON also lists up to k ranked "alternatives" (see
+    ClimbingRouteAnalyzer.plan_alternative_routes).
+    Module-level so it can be shipped to worker processes.
+    """
+    for event, payload in stream_route_json(image, image_name, wall_index, timings, k):
+        pass
+    return payload
+
+def stream_route_json(image=None, image_name="demo_image", wall_index=None, timings=None, k=1):
+    """Like analyze_to_route_json, but yields (event, payload) as each stage
+    finishes: "holds", "route", "instructions", then "result" with the full
+    route JSON."""
+    analyzer = ClimbingRouteAnalyzer(wall_index=wall_index)
+    for stage, result in analyzer.analyze_image_in_stages(image):
+        yield stage, result.to_dicts() if stage == "holds" else result
+
+    route_json = {
+        "route_info": {
+            "total_steps": len(result),
+            "difficulty": "intermediate",
+            "image": image_name
+        },
+        "holds": analyzer.holds.to_dicts(),
+        "instructions": result
+    }
+    if k > 1:
+        start = time.perf_counter()
+        route_json["alternatives"] = analyzer.plan_alternative_routes(k)
+        analyzer.timings["alternatives"] = time.perf_counter() - start
+
+    if timings is not None:
+        timings.update(analyzer.timings)
+
+    yield "result", route_json
+
 def create_text_visualization(route, width=80, height=40):
     """Create a simple text visualization of the route"""
     # Create a blank canvas
@@ -343,17 +541,26 @@ def create_text_visualization(route, width=80, height=40):
     return visualization
 
 if __name__ == "__main__":
-    import sys
+    import argparse
+    from profiling import Profiler
     
-    # Get the output filename
-    output_file = "climbing_route.json"
-    if len(sys.argv) > 1:
-        output_file = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Generate a climbing route with limb placements")
+    parser.add_argument("output_file", nargs="?", default="climbing_route.json", help="Where to save the route JSON")
+    parser.add_argument("--profile", nargs="?", const="route_analyzer_profile", default=None, metavar="PREFIX",
+                        help="Write a CPU profile, per-stage peak memory and a collapsed-stack file to PREFIX.*")
+    args = parser.parse_args()
+    output_file = args.output_file
     
-    # Create analyzer and generate route
-    analyzer = ClimbingRouteAnalyzer()
-    route = analyzer.analyze_image_and_generate_route()
-    analyzer.save_route_to_json(output_file)
+    prof = Profiler(args.profile, enabled=args.profile is not None)
+    with prof:
+        # Create analyzer and generate route
+        analyzer = ClimbingRouteAnalyzer()
+        stages = analyzer.analyze_image_in_stages()
+        for stage in ("holds", "route", "instructions"):
+            with prof.stage(stage):
+                _, route = next(stages)
+        with prof.stage("save_json"):
+            analyzer.save_route_to_json(output_file)
     
     print(f"Route with {len(route)} moves saved to {output_file}")
     
@@ -368,4 +575,6 @@ if __name__ == "__main__":
     for step in route:
         print(f"Step {step['step']}: {step['movement']} ({step['limb']})")
         print(f"  → {step['body_position']}")
-        print() 
\ No newline at end of file
+        print()
+    
+    prof.report()
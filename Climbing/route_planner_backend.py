@@ -15,101 +15,937 @@ Assumptions:
 """
 
 import os
+import time
+import heapq
 import cv2
 import numpy as np
 import networkx as nx
 
+from image_io import load_image
+from hold_set import HoldSet
+
 # ---------------- Configuration ----------------
 WEIGHT_HORIZ = 1.2    # cost multiplier for horizontal moves (>1 penalises lateral dynos)
+REACH_FRACTION = 0.5  # sparse graph: default reach radius as a fraction of the wall extent
+                      # (img.png needs moves of ~200 px on a 680 px wall)
+MIN_HOLD_AREA = 100   # blobs at or below this many pixels are treated as noise
+MIN_SATURATION = 50   # HSV floor for a pixel to count as a coloured hold
+MIN_VALUE = 50
+# Duplicate/fragment blobs: boxes within MERGE_GAP px, the smaller box at least
+# MERGE_SIZE_RATIO of the larger, and either different colours (fragments of a
+# multicolour hold) or the same colour overlapping by MERGE_OVERLAP of the smaller box
+MERGE_GAP = 2
+MERGE_SIZE_RATIO = 0.25
+MERGE_OVERLAP = 0.5
+
+# Colour ranges for the holds as (name, lower HSV, upper HSV)
+COLOR_RANGES = [
+    ("green", (35, MIN_SATURATION, MIN_VALUE), (85, 255, 255)),
+    ("blue", (90, MIN_SATURATION, MIN_VALUE), (130, 255, 255)),
+    # Orange/yellow holds
+    ("orange", (10, MIN_SATURATION, MIN_VALUE), (30, 255, 255)),
+    # Red holds (wraps around hue space)
+    ("red", (0, MIN_SATURATION, MIN_VALUE), (10, 255, 255)),
+    ("red", (160, MIN_SATURATION, MIN_VALUE), (180, 255, 255)),
+]
+COLOR_CLASSES = list(dict.fromkeys(c for c, _, _ in COLOR_RANGES))
 
 # ---------------- Core Functions ---------------
 
-def color_based_hold_detection(img_path):
-    """Detect holds based on color"""
-    img = cv2.imread(img_path)
-    if img is None:
-        raise ValueError(f"Could not read image at {img_path}")
-    
-    height, width, _ = img.shape
+def color_based_hold_detection(img_path, mode="contours", max_side=None, refine=False, wall_index=None,
+                               merge=True):
+    """Detect holds based on color
+
+    ``img_path`` may also be encoded image bytes or a decoded BGR ndarray.
+    mode="contours" scans the image once per colour range (the original
+    approach); mode="labels" classifies every pixel in a single lookup-table
+    pass and extracts all blobs with one connected-components call.
+
+    If ``max_side`` is given, images larger than that are detected on a
+    downscaled copy (see ``detect_holds_in_image``).  If a ``wall_index``
+    (see wall_index.py) is given, a near-duplicate photo of a wall seen
+    before reuses that wall's holds instead of running detection.
+
+    With ``merge`` (the default) duplicate and fragmented blobs are fused
+    first, see ``merge_duplicate_holds``.  Returns a HoldSet (see hold_set.py).
+    """
+    img = load_image(img_path)
+
+    if wall_index is not None:
+        entry = wall_index.match(img)
+        if entry is not None:
+            height, width = img.shape[:2]
+            holds = HoldSet.from_dicts(entry.holds_for((width, height)))
+            print(f"Recognised known wall, reusing {len(holds)} holds")
+            return holds
+
+    holds = detect_holds_in_image(img, mode=mode, max_side=max_side, refine=refine)
+    if merge:
+        holds, removed = merge_duplicate_holds(holds)
+        print(f"Merged away {removed} duplicate or fragment blobs")
+
+    for hold_id, hold in enumerate(holds):
+        hold["id"] = hold_id
+
+    if wall_index is not None:
+        wall_index.add(img, holds)
+
+    print(f"Detected {len(holds)} holds using color detection")
+    return HoldSet.from_dicts(holds)
+
+
+def _detector(mode):
+    if mode == "contours":
+        return detect_holds_contours
+    if mode == "labels":
+        return detect_holds_labels
+    raise ValueError(f"Unknown detection mode: {mode}")
+
+
+def detect_holds_in_image(img, mode="contours", max_side=None, refine=False):
+    """Detect holds in a BGR image, optionally on a downscaled copy.
+
+    When the longest side exceeds ``max_side`` the image is shrunk with area
+    interpolation, the noise threshold is scaled by the area ratio, and the
+    resulting x, y, w, h (and area) are mapped back to original-image
+    coordinates.  With ``refine=True`` each coarse blob is then re-detected at
+    full resolution inside a small window around it, so only those windows
+    are ever converted to HSV at full size.
+    """
+    detect = _detector(mode)
+    height, width = img.shape[:2]
+
+    if not max_side or max(height, width) <= max_side:
+        # Convert to HSV for better color detection
+        return detect(cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+
+    scale = max_side / max(height, width)
+    small = cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                       interpolation=cv2.INTER_AREA)
+    coarse = detect(cv2.cvtColor(small, cv2.COLOR_BGR2HSV), min_area=MIN_HOLD_AREA * scale * scale)
+    coarse = [_rescale_hold(h, 1.0 / scale) for h in coarse]
+
+    if refine:
+        return _refine_holds(img, coarse, detect, margin=2.0 / scale)
+    return coarse
+
+
+def _rescale_hold(hold, factor):
+    """Scale a hold's geometry by ``factor`` (area by its square)."""
+    hold = dict(hold)
+    for key in ("x", "y", "w", "h"):
+        hold[key] = hold[key] * factor
+    if "area" in hold:
+        hold["area"] = hold["area"] * factor * factor
+    return hold
+
+
+def _refine_holds(img, coarse, detect, margin):
+    """Re-detect each coarse hold at full resolution inside a window around it."""
+    height, width = img.shape[:2]
+    refined = []
+    seen = set()
+    for hold in coarse:
+        pad_x = hold["w"] * 0.25 + margin
+        pad_y = hold["h"] * 0.25 + margin
+        x0 = max(0, int(hold["x"] - hold["w"] / 2 - pad_x))
+        y0 = max(0, int(hold["y"] - hold["h"] / 2 - pad_y))
+        x1 = min(width, int(np.ceil(hold["x"] + hold["w"] / 2 + pad_x)))
+        y1 = min(height, int(np.ceil(hold["y"] + hold["h"] / 2 + pad_y)))
+
+        window = cv2.cvtColor(img[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+        candidates = detect(window)
+        if not candidates:
+            refined.append(hold)  # keep the coarse estimate
+            continue
+
+        # The coarse blob corresponds to the largest blob in its window
+        best = max(candidates, key=lambda h: h["area"])
+        best["x"] += x0
+        best["y"] += y0
+        key = (round(best["x"]), round(best["y"]))
+        if key in seen:
+            continue  # neighbouring windows found the same hold
+        seen.add(key)
+        refined.append(best)
+    return refined
+
+
+def downscale_report(img_path, max_side, mode="contours", refine=False):
+    """Compare downscaled detection against full resolution on one image.
+
+    Returns a dict with both latencies, the speed-up, hold counts, recall
+    (full-resolution holds matched within 1% of the image diagonal) and the
+    mean/max centroid error of matched holds as a fraction of the diagonal.
+    """
+    img = load_image(img_path)
+    diagonal = float(np.hypot(img.shape[0], img.shape[1]))
+
+    start = time.perf_counter()
+    full = detect_holds_in_image(img, mode=mode)
+    full_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = detect_holds_in_image(img, mode=mode, max_side=max_side, refine=refine)
+    fast_s = time.perf_counter() - start
+
+    errors = []
+    if fast:
+        fast_xy = np.array([[h["x"], h["y"]] for h in fast])
+        for h in full:
+            err = np.hypot(fast_xy[:, 0] - h["x"], fast_xy[:, 1] - h["y"]).min() / diagonal
+            if err <= 0.01:
+                errors.append(err)
+
+    return {
+        "max_side": max_side,
+        "refine": refine,
+        "full_ms": full_s * 1000,
+        "downscaled_ms": fast_s * 1000,
+        "speedup": full_s / fast_s if fast_s > 0 else float("inf"),
+        "full_holds": len(full),
+        "downscaled_holds": len(fast),
+        "recall": len(errors) / len(full) if full else 1.0,
+        "mean_error": float(np.mean(errors)) if errors else None,
+        "max_error": float(np.max(errors)) if errors else None,
+    }
+
+
+def detect_holds_contours(hsv, min_area=MIN_HOLD_AREA):
+    """One inRange + findContours pass per colour range."""
     holds = []
-    
-    # Convert to HSV for better color detection
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    
-    # Define color ranges for different holds (green, blue, orange, yellow, red)
-    color_ranges = [
-        # Green holds
-        (np.array([35, 50, 50]), np.array([85, 255, 255])),
-        # Blue holds
-        (np.array([90, 50, 50]), np.array([130, 255, 255])),
-        # Orange/yellow holds
-        (np.array([10, 50, 50]), np.array([30, 255, 255])),
-        # Red holds (wraps around hue space)
-        (np.array([0, 50, 50]), np.array([10, 255, 255])),
-        (np.array([160, 50, 50]), np.array([180, 255, 255]))
-    ]
-    
-    hold_id = 0
-    for lower, upper in color_ranges:
+    for color, lower, upper in COLOR_RANGES:
         # Create mask and find contours
-        mask = cv2.inRange(hsv, lower, upper)
+        mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         for contour in contours:
             area = cv2.contourArea(contour)
-            if area > 100:  # Filter small noise
+            if area > min_area:  # Filter small noise
                 x, y, w, h = cv2.boundingRect(contour)
                 x_c = x + w/2
                 y_c = y + h/2
-                holds.append({"id": hold_id, "x": float(x_c), "y": float(y_c), "w": float(w), "h": float(h)})
-                hold_id += 1
-    
-    print(f"Detected {len(holds)} holds using color detection")
+                holds.append({"x": float(x_c), "y": float(y_c), "w": float(w), "h": float(h),
+                              "color": color, "area": float(area)})
+    return holds
+
+
+def _hue_lookup_table():
+    """256-entry table mapping an OpenCV hue (0-179) to a 1-based colour class."""
+    lut = np.zeros(256, dtype=np.uint8)
+    # Earlier ranges take precedence where they touch (hue 10 is orange, not red)
+    for color, lower, upper in reversed(COLOR_RANGES):
+        lut[lower[0]:upper[0] + 1] = COLOR_CLASSES.index(color) + 1
+    return lut
+
+
+def detect_holds_labels(hsv, min_area=MIN_HOLD_AREA):
+    """Label all colour classes in one pass, then one connected-components call.
+
+    Each pixel's hue is mapped to a colour class through a lookup table (the red
+    wrap-around is a single class) and pixels below the saturation/value floor
+    are cleared.  Where pixels of two different classes touch, both sides of
+    the seam are cleared too, so every connected component holds exactly one
+    colour and touching holds of different colours stay separate holds, as
+    in contours mode (they lose a one-pixel rim of area along the seam).
+    Like contours mode, x/y is the centre of the blob's bounding box.
+    """
+    hue = cv2.split(hsv)[0]
+    classes = cv2.LUT(hue, _hue_lookup_table())
+    vivid = cv2.inRange(hsv, np.array([0, MIN_SATURATION, MIN_VALUE]), np.array([180, 255, 255]))
+    classes = cv2.bitwise_and(classes, vivid)
+
+    # Seam: pixels 8-adjacent to a pixel of another colour class
+    kernel = np.ones((3, 3), np.uint8)
+    seam = np.zeros_like(classes)
+    for cls in range(1, len(COLOR_CLASSES) + 1):
+        mask = cv2.inRange(classes, cls, cls)
+        if cv2.countNonZero(mask):
+            near = cv2.subtract(cv2.dilate(mask, kernel), mask)  # other pixels next to this class
+            seam = cv2.bitwise_or(seam, near)
+    classes[(seam > 0) & (classes > 0)] = 0
+
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(classes, connectivity=8)
+    if n <= 1:
+        return []
+
+    # Components are single-colour now: the class of any of their pixels
+    fg = np.flatnonzero(classes)
+    component_class = np.zeros(n, dtype=np.int64)
+    component_class[labels.ravel()[fg]] = classes.ravel()[fg]
+
+    holds = []
+    for comp in range(1, n):  # component 0 is the background
+        x, y, w, h, area = stats[comp]
+        if area <= min_area:  # Filter small noise
+            continue
+        holds.append({"x": float(x + w / 2), "y": float(y + h / 2), "w": float(w), "h": float(h),
+                      "color": COLOR_CLASSES[component_class[comp] - 1], "area": float(area)})
     return holds
 
 
+def _tile_grid(width, height, tile_size, overlap):
+    """Yield (x0, y0, x1, y1) windows of at most tile_size px overlapping by overlap px."""
+    step = max(1, tile_size - overlap)
+    ys = list(range(0, max(1, height - overlap), step))
+    xs = list(range(0, max(1, width - overlap), step))
+    for y0 in ys:
+        for x0 in xs:
+            yield x0, y0, min(width, x0 + tile_size), min(height, y0 + tile_size)
+
+
+def _detect_tile(task):
+    """Process-pool worker: detect holds in one tile of a memory-mapped image.
+
+    Returns blobs in global coordinates, each flagged ``clipped`` when its
+    bounding box touches a tile edge that is not also an image edge.
+    """
+    npy_path, (x0, y0, x1, y1), mode = task
+    img = np.load(npy_path, mmap_mode="r")
+    height, width = img.shape[:2]
+    tile = np.ascontiguousarray(img[y0:y1, x0:x1])
+    blobs = _detector(mode)(cv2.cvtColor(tile, cv2.COLOR_BGR2HSV), min_area=0)
+
+    for blob in blobs:
+        bx0 = blob["x"] - blob["w"] / 2
+        by0 = blob["y"] - blob["h"] / 2
+        blob["clipped"] = bool(
+            (x0 > 0 and bx0 <= 0) or (y0 > 0 and by0 <= 0)
+            or (x1 < width and bx0 + blob["w"] >= x1 - x0)
+            or (y1 < height and by0 + blob["h"] >= y1 - y0))
+        blob["x"] += x0
+        blob["y"] += y0
+        blob["tile"] = (x0, y0, x1, y1)
+    return blobs
+
+
+def _bbox(hold):
+    """(x0, y0, x1, y1) of a blob; both detectors report x/y as the box centre"""
+    return (hold["x"] - hold["w"] / 2, hold["y"] - hold["h"] / 2,
+            hold["x"] + hold["w"] / 2, hold["y"] + hold["h"] / 2)
+
+
+def _bboxes_touch(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _merge_tile_blobs(blobs, width, height, overlap, min_area):
+    """Fuse per-tile blobs into one list of holds.
+
+    A blob that is not clipped lies wholly inside its tile; it is kept only by
+    the tile whose core (the tile minus half the overlap on inner sides)
+    contains its centre, which removes the copies seen by neighbouring
+    tiles.  Clipped fragments are discarded when a whole copy was kept,
+    otherwise touching same-colour fragments are unioned into a single hold.
+    """
+    half = overlap / 2
+    kept = []
+    fragments = []
+    for blob in blobs:
+        if blob["clipped"]:
+            fragments.append(blob)
+            continue
+        x0, y0, x1, y1 = blob["tile"]
+        core = (x0 + half if x0 > 0 else 0, y0 + half if y0 > 0 else 0,
+                x1 - half if x1 < width else width, y1 - half if y1 < height else height)
+        if core[0] <= blob["x"] < core[2] or (x1 == width and blob["x"] == width):
+            if core[1] <= blob["y"] < core[3] or (y1 == height and blob["y"] == height):
+                if blob["area"] > min_area:
+                    kept.append(blob)
+
+    kept_boxes = [_bbox(h) for h in kept]
+    fragments = [f for f in fragments
+                 if not any(_bboxes_touch(_bbox(f), box) for box in kept_boxes)]
+
+    # Union-find over fragments that touch and share a colour
+    parent = list(range(len(fragments)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    boxes = [_bbox(f) for f in fragments]
+    for i in range(len(fragments)):
+        for j in range(i + 1, len(fragments)):
+            if fragments[i]["color"] == fragments[j]["color"] and _bboxes_touch(boxes[i], boxes[j]):
+                parent[find(i)] = find(j)
+
+    groups = {}
+    for i in range(len(fragments)):
+        groups.setdefault(find(i), []).append(i)
+    for members in groups.values():
+        bx0 = min(boxes[i][0] for i in members)
+        by0 = min(boxes[i][1] for i in members)
+        bx1 = max(boxes[i][2] for i in members)
+        by1 = max(boxes[i][3] for i in members)
+        # Fragments overlap inside the tile overlap, so the largest one is a
+        # lower bound on the area that avoids double counting
+        area = max(fragments[i]["area"] for i in members)
+        if area <= min_area:
+            continue
+        kept.append({"x": (bx0 + bx1) / 2, "y": (by0 + by1) / 2, "w": bx1 - bx0, "h": by1 - by0,
+                     "color": fragments[members[0]]["color"], "area": area})
+
+    for hold in kept:
+        hold.pop("clipped", None)
+        hold.pop("tile", None)
+    return kept
+
+
+def merge_duplicate_holds(holds, gap=MERGE_GAP):
+    """Fuse blobs that belong to the same physical hold (non-maximum suppression).
+
+    Contour detection reports one hold several times: both red hue ranges,
+    the orange band overlapping red at hue 10, and multicolour holds that split
+    into one blob per colour.  Two blobs are unioned when their bounding boxes
+    lie within ``gap`` pixels of each other, they are of comparable size (so a
+    small hold bolted onto a large coloured volume stays separate) and either
+    their colours differ or, for the same colour, the boxes overlap by at
+    least ``MERGE_OVERLAP`` of the smaller one (neighbouring holds of one
+    colour usually only graze each other's boxes).  Candidate pairs come from a
+    spatial hash (each box is registered in every grid cell it covers), so only
+    neighbouring blobs are compared rather than all pairs.  A merged hold
+    covers the union box (x/y is its centre, so x ± w/2 still gives the box,
+    like every other hold), has the summed area, and takes the colour with
+    the largest total area.  It has the same fields as an unmerged hold, so
+    rescaling, HoldSet and the route store treat both alike.
+
+    Returns (merged holds, number of blobs removed).
+    """
+    if len(holds) < 2:
+        return [dict(h) for h in holds], 0
+
+    boxes = [_bbox(h) for h in holds]
+    box_areas = [max(h["w"] * h["h"], 1e-9) for h in holds]
+    cell = 2 * float(np.median([max(h["w"], h["h"]) for h in holds])) + gap
+    grid = {}
+    for i, (x0, y0, x1, y1) in enumerate(boxes):
+        for gx in range(int((x0 - gap) // cell), int((x1 + gap) // cell) + 1):
+            for gy in range(int((y0 - gap) // cell), int((y1 + gap) // cell) + 1):
+                grid.setdefault((gx, gy), []).append(i)
+
+    parent = list(range(len(holds)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for members in grid.values():
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                i, j = members[a], members[b]
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                bi, bj = boxes[i], boxes[j]
+                if not (bi[0] - gap <= bj[2] and bj[0] - gap <= bi[2]
+                        and bi[1] - gap <= bj[3] and bj[1] - gap <= bi[3]):
+                    continue
+                smaller = min(box_areas[i], box_areas[j])
+                if smaller < MERGE_SIZE_RATIO * max(box_areas[i], box_areas[j]):
+                    continue
+                if holds[i]["color"] == holds[j]["color"]:
+                    overlap = (max(0.0, min(bi[2], bj[2]) - max(bi[0], bj[0]))
+                               * max(0.0, min(bi[3], bj[3]) - max(bi[1], bj[1])))
+                    if overlap < MERGE_OVERLAP * smaller:
+                        continue
+                parent[find(i)] = find(j)
+
+    groups = {}
+    for i in range(len(holds)):
+        groups.setdefault(find(i), []).append(i)
+
+    merged = []
+    for members in groups.values():
+        if len(members) == 1:
+            merged.append(dict(holds[members[0]]))
+            continue
+        areas = [holds[i].get("area", holds[i]["w"] * holds[i]["h"]) for i in members]
+        total = sum(areas)
+        x0 = min(boxes[i][0] for i in members)
+        y0 = min(boxes[i][1] for i in members)
+        x1 = max(boxes[i][2] for i in members)
+        y1 = max(boxes[i][3] for i in members)
+        by_color = {}
+        for i, area in zip(members, areas):
+            by_color[holds[i]["color"]] = by_color.get(holds[i]["color"], 0) + area
+        hold = dict(holds[max(members, key=lambda i: holds[i].get("area", 0))])
+        hold.update({
+            "x": (x0 + x1) / 2,
+            "y": (y0 + y1) / 2,
+            "w": x1 - x0,
+            "h": y1 - y0,
+            "color": max(by_color, key=by_color.get),
+        })
+        if "area" in hold:
+            hold["area"] = total
+        merged.append(hold)
+    return merged, len(holds) - len(merged)
+
+
+def tiled_hold_detection(img_path, tile_size=2048, overlap=256, mode="contours", workers=None, merge=True):
+    """Detect holds in a very large image tile by tile on a process pool.
+
+    The image is decoded once and spilled to a temporary memory-mapped .npy
+    file (a .npy input is mapped directly), so each worker only pulls its own
+    tile into memory and converts that tile to HSV; peak worker memory is
+    bounded by ``tile_size``.  ``overlap`` should exceed the largest hold so
+    every hold lies whole inside at least one tile; blobs cut by a seam are
+    merged back into a single hold either way.  Returns a HoldSet.
+    """
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    if overlap >= tile_size:
+        raise ValueError("overlap must be smaller than tile_size")
+
+    tmp_dir = None
+    if isinstance(img_path, str) and img_path.endswith(".npy"):
+        npy_path = img_path
+    else:
+        img = load_image(img_path)
+        tmp_dir = tempfile.TemporaryDirectory()
+        npy_path = os.path.join(tmp_dir.name, "image.npy")
+        np.save(npy_path, img)
+        del img
+
+    try:
+        height, width = np.load(npy_path, mmap_mode="r").shape[:2]
+        tasks = [(npy_path, window, mode) for window in _tile_grid(width, height, tile_size, overlap)]
+        blobs = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for tile_blobs in pool.map(_detect_tile, tasks):
+                blobs.extend(tile_blobs)
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    holds = _merge_tile_blobs(blobs, width, height, overlap, MIN_HOLD_AREA)
+    if merge:
+        holds, removed = merge_duplicate_holds(holds)
+        print(f"Merged away {removed} duplicate or fragment blobs")
+    for hold_id, hold in enumerate(holds):
+        hold["id"] = hold_id
+
+    print(f"Detected {len(holds)} holds using color detection on {len(tasks)} tiles")
+    return HoldSet.from_dicts(holds)
+
+
 def build_hold_graph(holds):
-    """Create a graph where each hold is a node; edges weighted by cost of moving."""
+    """Create a graph where each hold is a node; edges weighted by cost of moving.
+
+    Edges point upward on the wall (towards smaller y, since the top of the image
+    is y=0) so the graph is a DAG whose topological order is simply descending y.
+    """
     G = nx.DiGraph()
-    # Sort by vertical position (top of image is y=0)
-    holds_sorted = sorted(holds, key=lambda h: h["y"], reverse=False)  # top‑down
+    # Sort by vertical position, bottom of the wall first
+    holds_sorted = sorted(holds, key=lambda h: h["y"], reverse=True)  # bottom‑up
 
     for h in holds_sorted:
         G.add_node(h["id"], **h)
 
     for i, src in enumerate(holds_sorted):
         for j, dst in enumerate(holds_sorted):
-            if dst["y"] > src["y"]:  # only connect upward moves
-                dx = abs(dst["x"] - src["x"])
-                dy = abs(dst["y"] - src["y"])
-                cost = dy + WEIGHT_HORIZ * dx
-                G.add_edge(src["id"], dst["id"], weight=cost)
+            if dst["y"] < src["y"]:  # only connect upward moves
+                G.add_edge(src["id"], dst["id"], weight=move_cost(src, dst))
     return G
 
 
-def find_optimal_route(G):
-    """Return list of hold ids representing cheapest path from lowest to highest hold."""
-    # source nodes ~ bottom 20% of image; target nodes ~ top 20%
+def move_cost(src, dst):
+    """Cost of moving from hold ``src`` to hold ``dst``."""
+    dx = abs(dst["x"] - src["x"])
+    dy = abs(dst["y"] - src["y"])
+    return dy + WEIGHT_HORIZ * dx
+
+
+def default_reach(holds):
+    """Reach radius in pixels derived from the spread of the detected holds."""
+    if isinstance(holds, HoldSet):
+        xs, ys = holds.x, holds.y
+    else:
+        xs = np.array([h["x"] for h in holds])
+        ys = np.array([h["y"] for h in holds])
+    extent = max(np.ptp(xs), np.ptp(ys))
+    return REACH_FRACTION * extent if extent > 0 else 1.0
+
+
+def build_sparse_hold_graph(holds, reach=None, band=None):
+    """Create a hold graph that only links holds a climber can actually reach.
+
+    An upward edge src -> dst is added when dst lies within ``reach`` pixels of
+    src and inside a vertical band ``band`` pixels either side of it
+    (``band`` defaults to ``reach``).  Neighbours are looked up through a
+    uniform grid whose cell size equals the reach, so each hold only inspects
+    the cells around it and the build is O(n·k) for k holds within reach,
+    instead of the O(n²) of ``build_hold_graph``.  Edge weights are the same.
+
+    Raises ValueError if ``reach`` is not positive or ``band`` is negative.
+    """
+    _check_reach(reach, band)
+    G = nx.DiGraph()
+    if not holds:
+        return G
+
+    if reach is None:
+        reach = default_reach(holds)
+    if band is None:
+        band = reach
+    reach_sq = reach * reach
+    holds = list(holds)  # a HoldSet yields fresh dicts on every pass
+
+    # Bucket holds by grid cell
+    grid = {}
+    for h in holds:
+        G.add_node(h["id"], **h)
+        cell = (int(h["x"] // reach), int(h["y"] // reach))
+        grid.setdefault(cell, []).append(h)
+
+    for src in holds:
+        cx, cy = int(src["x"] // reach), int(src["y"] // reach)
+        # Targets are above the source (smaller y), so only this row and the one above
+        for gy in (cy - 1, cy):
+            for gx in (cx - 1, cx, cx + 1):
+                for dst in grid.get((gx, gy), ()):
+                    if _in_reach(src, dst, reach_sq, band):
+                        G.add_edge(src["id"], dst["id"], weight=move_cost(src, dst))
+    return G
+
+
+def build_route_graph(holds, reach=None, band=None):
+    """Sparse hold graph to search for routes on.
+
+    With an explicit ``reach`` this is ``build_sparse_hold_graph``.  With the
+    default reach, a wall whose holds are further apart than expected would
+    split into parts with no start-to-top path, so the reach is doubled until
+    some start hold reaches a top hold.  Once it spans the whole wall the graph
+    has the dense graph's edges, so no route the dense graph finds is lost.
+    The reach used is kept in ``G.graph["reach"]``.
+    """
+    G = build_sparse_hold_graph(holds, reach=reach, band=band)
+    if reach is not None or G.number_of_nodes() < 2:
+        G.graph["reach"] = reach
+        return G
+
+    xs = np.array([d["x"] for _, d in G.nodes(data=True)])
+    ys = np.array([d["y"] for _, d in G.nodes(data=True)])
+    diagonal = float(np.hypot(np.ptp(xs), np.ptp(ys)))
+    reach = default_reach(holds)
+    while True:
+        low_ids, top_ids = route_endpoints(G)
+        dist, _ = dag_shortest_paths(G, low_ids)
+        if any(t in dist for t in top_ids) or reach >= diagonal:
+            G.graph["reach"] = reach
+            return G
+        reach = min(2 * reach, diagonal)
+        G = build_sparse_hold_graph(holds, reach=reach, band=band if band is not None else reach)
+
+
+def _check_reach(reach, band=None):
+    if reach is not None and not reach > 0:  # also rejects NaN
+        raise ValueError("reach must be positive")
+    if band is not None and not band >= 0:
+        raise ValueError("band must not be negative")
+
+
+def _in_reach(src, dst, reach_sq, band):
+    """True if the sparse graph links src -> dst (dst above src and within reach)."""
+    if dst["y"] >= src["y"]:
+        return False
+    dx = dst["x"] - src["x"]
+    dy = dst["y"] - src["y"]
+    return abs(dx) <= band and dx * dx + dy * dy <= reach_sq
+
+
+def route_endpoints(G):
+    """Return (start_ids, top_ids): holds in the bottom and top 20% of the wall."""
     ys = np.array([d["y"] for _, d in G.nodes(data=True)])
     y_max, y_min = ys.max(), ys.min()
 
     low_ids = [n for n, d in G.nodes(data=True) if d["y"] >= y_max - 0.2 * (y_max - y_min)]
     top_ids = [n for n, d in G.nodes(data=True) if d["y"] <= y_min + 0.2 * (y_max - y_min)]
+    return low_ids, top_ids
+
+
+def dag_shortest_paths(G, sources):
+    """Single-pass shortest paths from a set of sources on the upward hold DAG.
+
+    Seeding every source at cost 0 is equivalent to adding a virtual super-source
+    joined to each of them by a zero-weight edge.  Nodes are relaxed once in
+    topological (descending y) order, so the whole pass is O(V + E).
+
+    Returns (dist, pred) dicts; unreachable nodes are absent from both.
+    """
+    order = sorted(G.nodes, key=lambda n: G.nodes[n]["y"], reverse=True)
+    dist = {s: 0.0 for s in sources}
+    pred = {s: None for s in sources}
+
+    for u in order:
+        du = dist.get(u)
+        if du is None:
+            continue
+        for v, attrs in G.succ[u].items():
+            cost = du + attrs["weight"]
+            if cost < dist.get(v, np.inf):
+                dist[v] = cost
+                pred[v] = u
+    return dist, pred
+
+
+def _walk_back(pred, node):
+    """Rebuild the path ending at ``node`` from a predecessor map."""
+    path = []
+    while node is not None:
+        path.append(node)
+        node = pred[node]
+    path.reverse()
+    return path
 
-    best_cost = np.inf
-    best_path = None
-
-    for s in low_ids:
-        for t in top_ids:
-            try:
-                path = nx.shortest_path(G, s, t, weight="weight")
-                cost = nx.path_weight(G, path, weight="weight")
-                if cost < best_cost:
-                    best_cost = cost
-                    best_path = path
-            except nx.NetworkXNoPath:
+
+def find_optimal_route(G):
+    """Return list of hold ids representing cheapest path from lowest to highest hold."""
+    if G.number_of_nodes() == 0:
+        return []
+
+    # source nodes ~ bottom 20% of image; target nodes ~ top 20%
+    low_ids, top_ids = route_endpoints(G)
+    dist, pred = dag_shortest_paths(G, low_ids)
+
+    # The cheapest reachable top hold plays the role of a virtual super-sink
+    reached = [t for t in top_ids if t in dist]
+    if not reached:
+        return []
+    best = min(reached, key=dist.get)
+    return _walk_back(pred, best)
+
+
+def find_optimal_routes(G, k=1):
+    """Return up to ``k`` cheapest routes as [{"rank", "cost", "route"}], best first.
+
+    Routes run from a start hold to a top hold, as in ``find_optimal_route``
+    (rank 1 is the same path).  The forward shortest-path tree is computed
+    once and reused for every candidate: see ``_k_best_paths``.
+    """
+    if G.number_of_nodes() == 0 or k < 1:
+        return []
+    low_ids, top_ids = route_endpoints(G)
+    dist, _ = dag_shortest_paths(G, low_ids)
+    return _k_best_paths(G, dist, set(low_ids), top_ids, k)
+
+
+def _k_best_paths(G, dist, sources, tops, k):
+    """k shortest start-to-top paths on the hold DAG, best first.
+
+    A best-first search runs backwards from the top holds.  Each partial path
+    (a suffix ending at a top hold) is ranked by its own cost plus ``dist`` of
+    its first hold, i.e. the exact cost of the cheapest way to complete it
+    from a start hold.  With an exact estimate every popped suffix extends to a
+    full route, so complete routes come off the heap in cost order and the work
+    is O(k·L·d·log) for routes of L holds with in-degree d, rather than k
+    full searches.  Paths cannot repeat holds because the graph is a DAG.
+    """
+    # Heap entries: (estimate, -cost, counter, cost, first hold, suffix).  On
+    # equal estimates the longer suffix goes first, which finishes tied routes
+    # one by one instead of widening all of them; counter keeps paths out of
+    # comparisons.
+    routes = []
+    heap = []
+    counter = 0
+    for t in tops:
+        if t in dist:
+            heap.append((dist[t], -0.0, counter, 0.0, t, (t, None)))
+            counter += 1
+    heapq.heapify(heap)
+
+    while heap and len(routes) < k:
+        _, _, _, cost, node, suffix = heapq.heappop(heap)
+        if node is None:  # suffix already starts at a start hold: a full route
+            route = []
+            while suffix is not None:
+                route.append(suffix[0])
+                suffix = suffix[1]
+            routes.append({"rank": len(routes) + 1, "cost": cost, "route": route})
+            continue
+        if node in sources:
+            heapq.heappush(heap, (cost, -cost, counter, cost, None, suffix))
+            counter += 1
+        for u, attrs in G.pred[node].items():
+            if u in dist:
+                c = cost + attrs["weight"]
+                heapq.heappush(heap, (c + dist[u], -c, counter, c, u, (u, suffix)))
+                counter += 1
+    return routes
+
+
+class RoutePlanner:
+    """Sparse hold graph plus shortest-path state that can be edited in place.
+
+    Users correct the detector by deleting false blobs, adding missed holds or
+    nudging a centroid.  Instead of rebuilding the graph and re-running the
+    search, each edit only relinks the edited hold to the holds in the grid
+    cells around it, then repairs the path costs: nodes are re-evaluated from
+    their predecessors in topological (descending y) order, starting at the
+    edited hold and its successors, and the repair stops spreading as soon as
+    a node's cost is unchanged.  The result matches ``find_optimal_route`` on
+    a freshly built graph.
+
+    ``reach`` (and the grid cell size) is fixed when the planner is created so
+    that edits stay local; by default it is the one ``build_route_graph``
+    settles on.  Pass it explicitly if holds may be added far outside the
+    initial wall extent.
+
+    Usage:
+        planner = RoutePlanner(holds)
+        planner.remove_hold(17)
+        planner.add_hold({"x": 410.0, "y": 655.0, "color": "green"})
+        planner.move_hold(4, 430.0, 742.0)
+        route = planner.route()
+    """
+
+    def __init__(self, holds, reach=None, band=None):
+        _check_reach(reach, band)
+        holds = [dict(h) for h in holds]
+        self.G = build_route_graph(holds, reach=reach, band=band)
+        self.reach = self.G.graph["reach"] or 1.0
+        self.band = band if band is not None else self.reach
+        self._reach_sq = self.reach * self.reach
+        self._grid = {}
+        for h in holds:
+            self._grid.setdefault(self._cell(h), set()).add(h["id"])
+        self._next_id = max((h["id"] for h in holds), default=-1) + 1
+        self._sources = set()
+        self._tops = []
+        self.dist, self.pred = {}, {}
+        self.last_update = {"edges": 0, "recomputed": 0}
+        self._refresh_sources()
+        self._propagate(self.G.nodes)
+
+    def _cell(self, hold):
+        return int(hold["x"] // self.reach), int(hold["y"] // self.reach)
+
+    # ---------------- edits ----------------
+
+    def add_hold(self, hold):
+        """Add a hold (dict with at least x and y); returns its id"""
+        hold = dict(hold)
+        if "id" not in hold:
+            hold["id"] = self._next_id
+        if hold["id"] in self.G:
+            raise ValueError(f"hold {hold['id']} already exists")
+        self._next_id = max(self._next_id, hold["id"] + 1)
+        edges = self._link(hold)
+        dirty = {hold["id"]} | self._refresh_sources()
+        self._propagate(dirty, edges)
+        return hold["id"]
+
+    def remove_hold(self, hold_id):
+        """Delete a hold and every move to or from it"""
+        hold = self.G.nodes[hold_id]
+        dirty = set(self.G.succ[hold_id])
+        edges = self.G.degree(hold_id)
+        self._unlink(hold_id, hold)
+        self.dist.pop(hold_id, None)
+        self.pred.pop(hold_id, None)
+        dirty |= self._refresh_sources()
+        self._propagate(dirty, edges)
+
+    def move_hold(self, hold_id, x, y):
+        """Correct a hold's centre to (x, y), keeping its other attributes"""
+        hold = dict(self.G.nodes[hold_id])
+        dirty = set(self.G.succ[hold_id]) | {hold_id}
+        edges = self.G.degree(hold_id)
+        self._unlink(hold_id, hold)
+        self.dist.pop(hold_id, None)  # so its new successors get re-evaluated
+        self.pred.pop(hold_id, None)
+        hold["x"], hold["y"] = x, y
+        edges += self._link(hold)
+        dirty |= self._refresh_sources()
+        self._propagate(dirty, edges)
+
+    def _link(self, hold):
+        """Insert a hold and its edges to the holds in the surrounding cells"""
+        hold_id = hold["id"]
+        self.G.add_node(hold_id, **hold)
+        cx, cy = self._cell(hold)
+        added = 0
+        for gy in (cy - 1, cy, cy + 1):
+            for gx in (cx - 1, cx, cx + 1):
+                for other_id in self._grid.get((gx, gy), ()):
+                    other = self.G.nodes[other_id]
+                    if _in_reach(hold, other, self._reach_sq, self.band):
+                        self.G.add_edge(hold_id, other_id, weight=move_cost(hold, other))
+                        added += 1
+                    elif _in_reach(other, hold, self._reach_sq, self.band):
+                        self.G.add_edge(other_id, hold_id, weight=move_cost(other, hold))
+                        added += 1
+        self._grid.setdefault((cx, cy), set()).add(hold_id)
+        return added
+
+    def _unlink(self, hold_id, hold):
+        self._grid[self._cell(hold)].discard(hold_id)
+        self.G.remove_node(hold_id)
+
+    # ---------------- incremental shortest paths ----------------
+
+    def _refresh_sources(self):
+        """Recompute the start holds; returns the ids whose start status changed"""
+        sources, self._tops = (route_endpoints(self.G) if self.G.number_of_nodes() else ([], []))
+        sources = set(sources)
+        changed = sources ^ self._sources
+        self._sources = sources
+        return {n for n in changed if n in self.G}
+
+    def _propagate(self, dirty, edges=0):
+        """Re-evaluate dist/pred from the dirty nodes upward until costs settle"""
+        heap = [(-self.G.nodes[n]["y"], n) for n in dirty]
+        heapq.heapify(heap)
+        queued = set(dirty)
+        recomputed = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            queued.discard(v)
+            recomputed += 1
+
+            if v in self._sources:
+                best, best_pred = 0.0, None
+            else:
+                best, best_pred = np.inf, None
+                for u, attrs in self.G.pred[v].items():
+                    cost = self.dist.get(u, np.inf) + attrs["weight"]
+                    if cost < best:
+                        best, best_pred = cost, u
+
+            if best == self.dist.get(v, np.inf) and best_pred == self.pred.get(v):
                 continue
-    return best_path or []
+            if best == np.inf:
+                self.dist.pop(v, None)
+                self.pred.pop(v, None)
+            else:
+                self.dist[v], self.pred[v] = best, best_pred
+            for w in self.G.succ[v]:
+                if w not in queued:
+                    queued.add(w)
+                    heapq.heappush(heap, (-self.G.nodes[w]["y"], w))
+        self.last_update = {"edges": edges, "recomputed": recomputed}
+
+    def route(self):
+        """Hold ids of the cheapest path from a start hold to a top hold"""
+        reached = [t for t in self._tops if t in self.dist]
+        if not reached:
+            return []
+        return _walk_back(self.pred, min(reached, key=self.dist.get))
+
+    def route_cost(self):
+        route = self.route()
+        return self.dist[route[-1]] if route else None
+
+    def routes(self, k):
+        """Up to k cheapest routes, reusing the maintained shortest-path tree"""
+        return _k_best_paths(self.G, self.dist, self._sources, self._tops, k)
 
 
 def route_to_steps(route, G):
@@ -127,56 +963,107 @@ def route_to_steps(route, G):
         )
     return steps
 
-def visualize_route(img_path, steps):
-    """Visualize the detected holds and route on the image"""
-    img = cv2.imread(img_path)
-    if img is None:
-        raise ValueError(f"Could not read image at {img_path}")
-    
-    # Draw detected holds and route
-    for i, step in enumerate(steps):
-        x, y = step["x"], step["y"]
-        # Draw circle for hold position
-        cv2.circle(img, (x, y), 15, (0, 255, 0), 2)
-        # Draw step number
-        cv2.putText(img, str(step["step"]), (x + 20, y), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        
-        # Draw line for route
-        if i < len(steps) - 1:
-            next_x, next_y = steps[i + 1]["x"], steps[i + 1]["y"]
-            cv2.line(img, (x, y), (next_x, next_y), (255, 0, 0), 2)
+def visualize_route(img_path, steps, output_path="climbing_route_visualization.jpg"):
+    """Visualize the detected holds and route on the image and save it to output_path"""
+    from route_render import draw_route
+
+    img = load_image(img_path)
+    if img is img_path:
+        img = img.copy()  # never draw on the caller's array
+    draw_route(img, steps)
     
     # Save the visualization
-    output_path = "climbing_route_visualization.jpg"
     cv2.imwrite(output_path, img)
-    print(f"Route visualization saved to {output_path}")
     return output_path
 
 # ---------------- CLI / Demo ------------------
 if __name__ == "__main__":
-    import argparse, json
+    import argparse
+    import json
+    from cli_args import positive_float
+    from profiling import Profiler
 
     parser = argparse.ArgumentParser(description="Compute optimal climbing route from image")
     parser.add_argument("image", help="Path to climbing wall image")
     parser.add_argument("--json_out", default="route.json", help="Where to save route JSON")
     parser.add_argument("--visualize", action="store_true", help="Visualize detected route")
+    parser.add_argument("--vis-out", default="climbing_route_visualization.jpg",
+                        help="Where to save the --visualize image")
+    parser.add_argument("--mode", choices=["contours", "labels"], default="contours",
+                        help="Hold segmentation: per-colour contours or single-pass labelling")
+    parser.add_argument("--max-side", type=int, default=None,
+                        help="Detect on a copy downscaled so its longest side is at most this many pixels")
+    parser.add_argument("--refine", action="store_true",
+                        help="With --max-side, refine each hold at full resolution around the coarse blob")
+    parser.add_argument("--scale-report", action="store_true",
+                        help="Print latency/accuracy of --max-side detection against full resolution and exit")
+    parser.add_argument("--tile", type=int, default=None,
+                        help="Detect tile by tile (tile size in pixels) on a process pool, for huge panoramas")
+    parser.add_argument("--overlap", type=int, default=None,
+                        help="Overlap between tiles in pixels; should exceed the largest hold "
+                             "(default: 256, at most a quarter of --tile)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --tile (default: all cores)")
+    parser.add_argument("--no-merge", action="store_true",
+                        help="Keep duplicate/fragment blobs instead of fusing them into one hold")
+    parser.add_argument("--reach", type=positive_float, default=None,
+                        help="Max move length in pixels (default: half the wall extent, "
+                             "widened if no route fits)")
+    parser.add_argument("--dense", action="store_true",
+                        help="Connect every pair of holds instead of using a reach-bounded graph")
+    parser.add_argument("--alternatives", type=int, default=1, metavar="K",
+                        help="Save the K cheapest routes (ranked, with costs) instead of only the best")
+    parser.add_argument("--profile", nargs="?", const="route_planner_profile", default=None, metavar="PREFIX",
+                        help="Write a CPU profile, per-stage peak memory and a collapsed-stack file to PREFIX.*")
     args = parser.parse_args()
 
-    holds = color_based_hold_detection(args.image)
-    if len(holds) < 2:
-        raise SystemExit("Not enough holds detected – check image quality or adjust color ranges.")
+    if args.scale_report:
+        report = downscale_report(args.image, args.max_side or 1024, mode=args.mode, refine=args.refine)
+        print(json.dumps(report, indent=2))
+        raise SystemExit(0)
 
-    G = build_hold_graph(holds)
-    route = find_optimal_route(G)
+    prof = Profiler(args.profile, enabled=args.profile is not None)
+    with prof:
+        with prof.stage("detect"):
+            if args.tile:
+                overlap = args.overlap if args.overlap is not None else min(256, args.tile // 4)
+                holds = tiled_hold_detection(args.image, tile_size=args.tile, overlap=overlap, mode=args.mode,
+                                             workers=args.workers, merge=not args.no_merge)
+            else:
+                holds = color_based_hold_detection(args.image, mode=args.mode, max_side=args.max_side,
+                                                   refine=args.refine, merge=not args.no_merge)
+        if len(holds) < 2:
+            raise SystemExit("Not enough holds detected – check image quality or adjust color ranges.")
 
-    if not route:
-        raise SystemExit("No path found from bottom to top – try relaxing constraints.")
+        with prof.stage("graph"):
+            if args.dense:
+                G = build_hold_graph(holds)
+            else:
+                G = build_route_graph(holds, reach=args.reach)
+        with prof.stage("path_search"):
+            routes = find_optimal_routes(G, k=max(1, args.alternatives))
 
-    steps = route_to_steps(route, G)
-    with open(args.json_out, "w") as f:
-        json.dump(steps, f, indent=2)
-    print(f"Route with {len(steps)} moves saved to {args.json_out}")
-    
-    if args.visualize:
-        vis_path = visualize_route(args.image, steps)
-        print(f"Route visualization saved to {vis_path}") 
\ No newline at end of file
+        if not routes:
+            raise SystemExit("No path found from bottom to top – try relaxing constraints (e.g. a larger --reach).")
+
+        with prof.stage("steps_json"):
+            steps = route_to_steps(routes[0]["route"], G)
+            if args.alternatives > 1:
+                ranked = [{"rank": r["rank"], "cost": r["cost"], "steps": route_to_steps(r["route"], G)}
+                          for r in routes]
+                with open(args.json_out, "w") as f:
+                    json.dump(ranked, f, indent=2)
+            else:
+                with open(args.json_out, "w") as f:
+                    json.dump(steps, f, indent=2)
+        if args.alternatives > 1:
+            for r in routes:
+                print(f"Route {r['rank']}: {len(r['route'])} moves, cost {r['cost']:.1f}")
+            print(f"{len(routes)} ranked routes saved to {args.json_out}")
+        else:
+            print(f"Route with {len(steps)} moves saved to {args.json_out}")
+        
+        if args.visualize:
+            with prof.stage("visualize"):
+                vis_path = visualize_route(args.image, steps, args.vis_out)
+            print(f"Route visualization saved to {vis_path}")
+    prof.report()
@@ -0,0 +1,153 @@
+"""
+Route Render
+------------
+Draws route overlays on wall photos for the server's /render endpoint.
+
+Rendering from scratch means decoding a multi-megapixel photo, drawing on it
+and encoding it again, for every request.  An OverlayRenderer instead keeps,
+per upload, a small pyramid of decoded copies (full size, then halved
+repeatedly down to PYRAMID_MIN_SIDE) built once with INTER_AREA.  A request
+for a given size starts from the smallest level at least that large, so a
+phone asking for a 512 px preview never touches the full-resolution pixels.
+Overlays are drawn on a copy of the level, never on the cached image, and
+the encoded results are kept in a second LRU keyed by everything that
+affects the bytes, bounded both by count and by their total size (a
+full-size render of a large photo is several megabytes).
+
+draw_route() is also used by route_planner_backend.visualize_route.
+
+Usage:
+    renderer = OverlayRenderer(max_images=4, max_render_bytes=64 * 1024 * 1024)
+    data, mimetype = renderer.render("3f2a...9c.jpg", "uploads/3f2a...9c.jpg", steps,
+                                     max_side=800, fmt="webp")
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from image_io import load_image
+
+PYRAMID_MIN_SIDE = 256  # stop halving once the longest side is at or below this
+DEFAULT_QUALITY = 85
+FORMATS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, "image/jpeg"),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, "image/webp"),
+}
+
+HOLD_COLOR = (0, 255, 0)    # BGR
+ROUTE_COLOR = (255, 0, 0)
+HOLD_RADIUS = 15            # at full resolution; scaled with the image
+
+
+def draw_route(img, steps, scale=1.0):
+    """Draw numbered holds and the path between them onto img in place
+
+    steps are route steps with "step", "x" and "y" in full-resolution pixels;
+    scale maps them onto img (e.g. 0.25 for a quarter-size thumbnail).
+    Line widths shrink with the image but never below one pixel.
+    """
+    radius = max(3, round(HOLD_RADIUS * scale))
+    thickness = max(1, round(2 * scale))
+    font_scale = max(0.4, scale)
+    points = [(int(round(s["x"] * scale)), int(round(s["y"] * scale))) for s in steps]
+    for (x, y), (next_x, next_y) in zip(points, points[1:]):
+        cv2.line(img, (x, y), (next_x, next_y), ROUTE_COLOR, thickness)
+    for step, (x, y) in zip(steps, points):
+        cv2.circle(img, (x, y), radius, HOLD_COLOR, thickness)
+        cv2.putText(img, str(step["step"]), (x + radius + 5, y), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, HOLD_COLOR, thickness)
+    return img
+
+
+def build_pyramid(img, min_side=PYRAMID_MIN_SIDE):
+    """[full image, half size, quarter size, ...] down to min_side"""
+    levels = [img]
+    while max(levels[-1].shape[:2]) > min_side:
+        h, w = levels[-1].shape[:2]
+        levels.append(cv2.resize(levels[-1], (max(1, w // 2), max(1, h // 2)), interpolation=cv2.INTER_AREA))
+    return levels
+
+
+class OverlayRenderer:
+    def __init__(self, max_images=4, max_renders=256, max_render_bytes=64 * 1024 * 1024):
+        self.max_images = max_images     # decoded pyramids kept (~1.3x the raw pixels each)
+        self.max_renders = max_renders   # encoded outputs kept
+        self.max_render_bytes = max_render_bytes  # total size of the encoded outputs kept
+        self._pyramids = OrderedDict()   # image key -> pyramid levels
+        self._renders = OrderedDict()    # render key -> (bytes, mimetype)
+        self._render_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"pyramids_built": 0, "renders": 0, "render_hits": 0, "render_evictions": 0}
+
+    def pyramid(self, key, source):
+        """Cached pyramid for an image, decoding source (path or bytes) on a miss"""
+        with self._lock:
+            if key in self._pyramids:
+                self._pyramids.move_to_end(key)
+                return self._pyramids[key]
+        levels = build_pyramid(load_image(source))
+        with self._lock:
+            self._pyramids[key] = levels
+            self._pyramids.move_to_end(key)
+            while len(self._pyramids) > self.max_images:
+                self._pyramids.popitem(last=False)
+            self.stats["pyramids_built"] += 1
+        return levels
+
+    def render(self, key, source, steps=None, max_side=None, fmt="jpeg", quality=DEFAULT_QUALITY,
+               route_key=None):
+        """Encoded image of source at most max_side px on its longest side,
+        with the route steps drawn on it if given; returns (bytes, mimetype)
+
+        key identifies the image (e.g. its content-addressed upload name) and
+        route_key the overlay; together with the size, format and quality
+        they key the cache of encoded results, so pass a route_key whenever
+        steps are given.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        cache_key = (key, route_key if steps else None, max_side, fmt, quality)
+        with self._lock:
+            if cache_key in self._renders:
+                self._renders.move_to_end(cache_key)
+                self.stats["render_hits"] += 1
+                return self._renders[cache_key]
+
+        levels = self.pyramid(key, source)
+        full_side = max(levels[0].shape[:2])
+        target_side = min(max_side or full_side, full_side)
+        # Smallest level that is still at least the requested size
+        level = next(lvl for lvl in reversed(levels) if max(lvl.shape[:2]) >= target_side)
+        if max(level.shape[:2]) != target_side:
+            h, w = level.shape[:2]
+            factor = target_side / max(h, w)
+            img = cv2.resize(level, (max(1, round(w * factor)), max(1, round(h * factor))),
+                             interpolation=cv2.INTER_AREA)
+        else:
+            img = level.copy() if steps else level  # never draw on a cached level
+        if steps:
+            draw_route(img, steps, scale=img.shape[1] / levels[0].shape[1])
+
+        extension, quality_flag, mimetype = FORMATS[fmt]
+        ok, encoded = cv2.imencode(extension, img, [quality_flag, int(quality)])
+        if not ok:
+            raise ValueError(f"Could not encode image as {fmt}")
+        result = (encoded.tobytes(), mimetype)
+        with self._lock:
+            self.stats["renders"] += 1
+            # A render larger than the whole budget is served but not kept
+            if len(result[0]) <= self.max_render_bytes and cache_key not in self._renders:
+                self._renders[cache_key] = result
+                self._render_bytes += len(result[0])
+                while len(self._renders) > self.max_renders or self._render_bytes > self.max_render_bytes:
+                    _, (data, _) = self._renders.popitem(last=False)
+                    self._render_bytes -= len(data)
+                    self.stats["render_evictions"] += 1
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, pyramids=len(self._pyramids), cached_renders=len(self._renders),
+                        cached_render_bytes=self._render_bytes)
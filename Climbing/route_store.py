@@ -0,0 +1,227 @@
+"""
+Route Store
+-----------
+Embedded SQLite store for analysed walls, their holds, routes and
+instructions, so results outlive the process and can be queried later.
+
+Tables:
+- walls         one row per analysis, keyed by the same content hash as the
+                analysis cache (image bytes + parameters); keeps the route
+                JSON exactly as served so it can be returned without
+                recomputation
+- holds         one row per hold with its geometry, colour and type
+- hold_rtree    R-tree over the hold bounding boxes for region queries
+- routes        the main route and any alternatives, ranked by cost, with
+                a flag marking the main route
+- route_holds   (route, step) -> hold, indexed by hold for "routes through X"
+- instructions  per-step limb and movement text of the main route
+
+Every wall is written in one transaction with executemany() bulk inserts.
+One connection is shared behind a lock, so the store can be used from the
+server's request threads.
+
+Usage:
+    store = RouteStore("climb_routes.db")
+    wall_id = store.save_analysis(key, route_json, image="wall.jpg")
+    route_json = store.load_analysis(key)
+    store.holds_in_region(100, 200, 400, 600, wall_id=wall_id)
+    store.routes_through_hold(wall_id, hold_id=7)
+"""
+
+import json
+import time
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS walls (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    image TEXT,
+    created REAL NOT NULL,
+    result TEXT
+);
+CREATE TABLE IF NOT EXISTS holds (
+    id INTEGER PRIMARY KEY,
+    wall_id INTEGER NOT NULL REFERENCES walls(id) ON DELETE CASCADE,
+    hold_id INTEGER NOT NULL,
+    x REAL NOT NULL, y REAL NOT NULL, w REAL, h REAL, area REAL,
+    color TEXT, type TEXT, size TEXT,
+    UNIQUE (wall_id, hold_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS hold_rtree USING rtree(id, min_x, max_x, min_y, max_y);
+CREATE TABLE IF NOT EXISTS routes (
+    id INTEGER PRIMARY KEY,
+    wall_id INTEGER NOT NULL REFERENCES walls(id) ON DELETE CASCADE,
+    rank INTEGER NOT NULL,
+    cost REAL,
+    main INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (wall_id, rank)
+);
+CREATE TABLE IF NOT EXISTS route_holds (
+    route_id INTEGER NOT NULL REFERENCES routes(id) ON DELETE CASCADE,
+    step INTEGER NOT NULL,
+    wall_id INTEGER NOT NULL,
+    hold_id INTEGER NOT NULL,
+    PRIMARY KEY (route_id, step)
+);
+CREATE INDEX IF NOT EXISTS route_holds_by_hold ON route_holds (wall_id, hold_id);
+CREATE TABLE IF NOT EXISTS instructions (
+    wall_id INTEGER NOT NULL REFERENCES walls(id) ON DELETE CASCADE,
+    step INTEGER NOT NULL,
+    hold_id INTEGER,
+    limb TEXT,
+    movement TEXT,
+    body_position TEXT,
+    PRIMARY KEY (wall_id, step)
+);
+"""
+
+# Box half-size used in the R-tree for holds without a width/height
+POINT_HOLD_RADIUS = 15.0
+
+
+class RouteStore:
+    def __init__(self, path="climb_routes.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            # Stores written before routes had a main flag
+            if "main" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(routes)")}:
+                self._conn.execute("ALTER TABLE routes ADD COLUMN main INTEGER NOT NULL DEFAULT 0")
+
+    # ---------------- writes ----------------
+
+    def save_wall(self, key, holds, routes, image=None, instructions=(), result=None):
+        """Store one analysed wall, replacing any earlier wall with the same key
+
+        holds:        hold dicts (id, x, y and optional w, h, area, color, type, size)
+        routes:       [{"rank", "cost", "main", "route": [hold ids]}], main marks the main route
+        instructions: the analyzer's instruction dicts for the main route
+        result:       the JSON document to hand back from load_analysis
+        Returns the wall id.
+        """
+        hold_rows = []
+        for hold in holds:
+            hold_rows.append((hold["id"], hold["x"], hold["y"], hold.get("w"), hold.get("h"),
+                              hold.get("area"), hold.get("color"), hold.get("type"), hold.get("size")))
+        with self._lock, self._conn:
+            self._delete(key)
+            cur = self._conn.execute(
+                "INSERT INTO walls (key, image, created, result) VALUES (?, ?, ?, ?)",
+                (key, image, time.time(), json.dumps(result) if result is not None else None))
+            wall_id = cur.lastrowid
+
+            self._conn.executemany(
+                "INSERT INTO holds (wall_id, hold_id, x, y, w, h, area, color, type, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(wall_id,) + row for row in hold_rows])
+            self._conn.execute(
+                "INSERT INTO hold_rtree (id, min_x, max_x, min_y, max_y)"
+                " SELECT id, x - coalesce(w / 2, ?), x + coalesce(w / 2, ?),"
+                "        y - coalesce(h / 2, ?), y + coalesce(h / 2, ?)"
+                " FROM holds WHERE wall_id = ?",
+                (POINT_HOLD_RADIUS,) * 4 + (wall_id,))
+
+            for route in routes:
+                cur = self._conn.execute("INSERT INTO routes (wall_id, rank, cost, main) VALUES (?, ?, ?, ?)",
+                                         (wall_id, route["rank"], route.get("cost"), int(route.get("main", False))))
+                self._conn.executemany(
+                    "INSERT INTO route_holds (route_id, step, wall_id, hold_id) VALUES (?, ?, ?, ?)",
+                    [(cur.lastrowid, step, wall_id, hold_id)
+                     for step, hold_id in enumerate(route["route"], start=1)])
+
+            self._conn.executemany(
+                "INSERT INTO instructions (wall_id, step, hold_id, limb, movement, body_position)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(wall_id, ins["step"], ins["hold"]["id"], ins.get("limb"), ins.get("movement"),
+                  ins.get("body_position")) for ins in instructions])
+        return wall_id
+
+    def save_analysis(self, key, route_json, image=None):
+        """Store the route JSON produced by route_analyzer.analyze_to_route_json"""
+        instructions = route_json.get("instructions", [])
+        # The alternatives include the main route, with its cost
+        routes = [{"rank": alt["rank"], "cost": alt["cost"], "main": alt.get("main", False),
+                   "route": [step["hold_id"] for step in alt["route"]]}
+                  for alt in route_json.get("alternatives", [])]
+        if not routes:
+            routes = [{"rank": 1, "cost": None, "main": True, "route": [ins["hold"]["id"] for ins in instructions]}]
+        return self.save_wall(key, route_json.get("holds", []), routes, image=image,
+                              instructions=instructions, result=route_json)
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._delete(key)
+
+    def _delete(self, key):
+        row = self._conn.execute("SELECT id FROM walls WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM hold_rtree WHERE id IN (SELECT id FROM holds WHERE wall_id = ?)",
+                           (row["id"],))
+        self._conn.execute("DELETE FROM route_holds WHERE wall_id = ?", (row["id"],))
+        self._conn.execute("DELETE FROM walls WHERE id = ?", (row["id"],))
+
+    # ---------------- reads ----------------
+
+    def load_analysis(self, key):
+        """Stored route JSON for key, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM walls WHERE key = ?", (key,)).fetchone()
+        if row is None or row["result"] is None:
+            return None
+        return json.loads(row["result"])
+
+    def wall_id(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM walls WHERE key = ?", (key,)).fetchone()
+        return row["id"] if row else None
+
+    def walls(self):
+        """[{"id", "key", "image", "created", "holds"}] for every stored wall"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT w.id, w.key, w.image, w.created, count(h.id) AS holds"
+                " FROM walls w LEFT JOIN holds h ON h.wall_id = w.id GROUP BY w.id ORDER BY w.id").fetchall()
+        return [dict(row) for row in rows]
+
+    def holds_in_region(self, x0, y0, x1, y1, wall_id=None):
+        """Holds whose bounding box intersects the rectangle (x0, y0)-(x1, y1)"""
+        sql = ("SELECT h.wall_id, h.hold_id AS id, h.x, h.y, h.w, h.h, h.area, h.color, h.type, h.size"
+               " FROM hold_rtree r JOIN holds h ON h.id = r.id"
+               " WHERE r.max_x >= ? AND r.min_x <= ? AND r.max_y >= ? AND r.min_y <= ?")
+        args = [x0, x1, y0, y1]
+        if wall_id is not None:
+            sql += " AND h.wall_id = ?"
+            args.append(wall_id)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY h.wall_id, h.hold_id", args).fetchall()
+        return [{k: v for k, v in dict(row).items() if v is not None} for row in rows]
+
+    def routes_through_hold(self, wall_id, hold_id):
+        """[{"route_id", "rank", "cost", "main", "step", "holds"}] for routes that use the hold"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.id AS route_id, r.rank, r.cost, r.main, rh.step FROM route_holds rh"
+                " JOIN routes r ON r.id = rh.route_id"
+                " WHERE rh.wall_id = ? AND rh.hold_id = ? ORDER BY r.rank",
+                (wall_id, hold_id)).fetchall()
+            result = []
+            for row in rows:
+                route = dict(row)
+                route["main"] = bool(route["main"])
+                route["holds"] = [r["hold_id"] for r in self._conn.execute(
+                    "SELECT hold_id FROM route_holds WHERE route_id = ? ORDER BY step", (row["route_id"],))]
+                result.append(route)
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,19 +5,156 @@ A simple Flask server that handles image uploads, analyzes climbing routes,
 and returns optimized routes with limb placement suggestions.
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, abort, g, request, jsonify, send_file, send_from_directory, stream_with_context
 import os
 import base64
+import binascii
+import hashlib
 import json
 import time
-from route_analyzer import ClimbingRouteAnalyzer
+import threading
+from functools import partial
+from route_analyzer import analyze_to_route_json, stream_route_json
+from analysis_cache import AnalysisCache
+from route_store import RouteStore
+from upload_store import UploadStore, upload_name
+from job_queue import JobQueue, QueueFull
+from metrics import MetricsRegistry, StageTimings
+import warmup
+import wire_format
+
+# OpenCV, NumPy and networkx are imported on first use; CLIMB_PRELOAD=1 loads
+# them (and runs one demo analysis) now, so pre-forked workers share them
+CLIMB_PRELOAD = os.environ.get('CLIMB_PRELOAD', '').lower() in ('1', 'true')
+if CLIMB_PRELOAD:
+    preload_seconds = warmup.preload()
+    print("Preloaded " + ", ".join(f"{name} ({seconds * 1000:.0f} ms)"
+                                   for name, seconds in preload_seconds.items()))
 
 app = Flask(__name__)
 
-# Configure upload folder
+# Largest request body accepted (larger uploads get a 413); MAX_UPLOAD_MB overrides
+MAX_UPLOAD_BYTES = int(float(os.environ.get('MAX_UPLOAD_MB', 32)) * 1024 * 1024)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+# Configure upload folder: content-addressed files, least recently used evicted
+# beyond UPLOAD_MAX_MB or after UPLOAD_MAX_AGE_DAYS without use (0 = keep)
 UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+UPLOAD_MAX_BYTES = int(float(os.environ.get('UPLOAD_MAX_MB', 500)) * 1024 * 1024)
+UPLOAD_MAX_AGE = float(os.environ.get('UPLOAD_MAX_AGE_DAYS', 30)) * 86400 or None
+upload_store = UploadStore(UPLOAD_FOLDER, max_bytes=UPLOAD_MAX_BYTES, max_age=UPLOAD_MAX_AGE)
+
+# Uploads never change under their name, so browsers may keep them this long
+UPLOAD_CACHE_SECONDS = 365 * 86400
+
+# Configure analysis cache (set ANALYSIS_CACHE_DIR to enable the on-disk tier)
+ANALYSIS_CACHE_ENTRIES = 128
+ANALYSIS_CACHE_DIR = os.environ.get('ANALYSIS_CACHE_DIR')
+ANALYSIS_CACHE_MAX_BYTES = 100 * 1024 * 1024
+analysis_cache = AnalysisCache(max_entries=ANALYSIS_CACHE_ENTRIES,
+                               disk_dir=ANALYSIS_CACHE_DIR,
+                               max_disk_bytes=ANALYSIS_CACHE_MAX_BYTES)
+
+DEMO_CACHE_KEY_BYTES = b'demo_image'
+
+# Persistent store of analysed walls, kept with the uploads (set ROUTE_STORE_PATH
+# to '' to disable).  Opened on first use, once per process (see get_route_store)
+ROUTE_STORE_PATH = os.environ.get('ROUTE_STORE_PATH', os.path.join(UPLOAD_FOLDER, 'climb_routes.db'))
+route_store = None
+route_store_pid = None
+route_store_lock = threading.Lock()
+
+def get_route_store():
+    """This process's RouteStore, opened on first use; None when disabled
+
+    SQLite connections must not cross a fork, so a forked worker that finds
+    its parent's store opens its own connection.
+    """
+    global route_store, route_store_pid
+    if not ROUTE_STORE_PATH:
+        return None
+    with route_store_lock:
+        if route_store is None or route_store_pid != os.getpid():
+            route_store = RouteStore(ROUTE_STORE_PATH)
+            route_store_pid = os.getpid()
+    return route_store
+
+def reopen_route_store():
+    """Drop the inherited store connection; a pre-forking server calls this in
+    every worker, and get_route_store() opens a fresh one on first use"""
+    global route_store, route_store_pid
+    route_store, route_store_pid = None, None
+
+# Most alternative routes a request may ask for with "k"
+MAX_ALTERNATIVES = 10
+
+# Read raw-body uploads in chunks of this many bytes
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Recognises re-photographed walls so their holds can be reused (see get_wall_index)
+wall_index = None
+wall_index_lock = threading.Lock()
+
+# Route overlays and thumbnails (/render): decoded photo pyramids kept in memory,
+# and encoded renders up to RENDER_CACHE_MB in total
+RENDER_CACHE_IMAGES = int(os.environ.get('RENDER_CACHE_IMAGES', 4))
+RENDER_CACHE_BYTES = int(float(os.environ.get('RENDER_CACHE_MB', 64)) * 1024 * 1024)
+RENDER_MAX_SIDE = 4096
+overlay_renderer = None
+overlay_renderer_lock = threading.Lock()
+
+# Background analysis jobs (/jobs): worker processes and max jobs in flight
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', os.cpu_count() or 1))
+JOB_QUEUE_DEPTH = int(os.environ.get('JOB_QUEUE_DEPTH', 16))
+job_queue = JobQueue(max_workers=JOB_WORKERS, max_pending=JOB_QUEUE_DEPTH,
+                     initializer=warmup.preload_worker)
+
+# Request/stage latency histograms and counters, exposed on /metrics
+metrics = MetricsRegistry()
+metrics.describe('climb_requests_total', 'HTTP requests by endpoint and status')
+metrics.describe('climb_request_bytes_total', 'Request body bytes received')
+metrics.describe('climb_response_bytes_total', 'Response body bytes sent (non-streaming)')
+metrics.describe('climb_request_duration_seconds', 'Request latency by endpoint')
+metrics.describe('climb_stage_duration_seconds', 'Time spent in each analysis stage')
+metrics.describe('climb_cache_hits_total', 'Analysis cache hits (memory and disk)')
+metrics.describe('climb_cache_misses_total', 'Analysis cache misses')
+metrics.describe('climb_job_queue_depth', 'Analysis jobs queued or running')
+metrics.gauge('climb_cache_hits_total', lambda: analysis_cache.snapshot()['hits'], kind='counter')
+metrics.gauge('climb_cache_misses_total', lambda: analysis_cache.snapshot()['misses'], kind='counter')
+metrics.gauge('climb_job_queue_depth', job_queue.depth)
+metrics.describe('climb_upload_bytes', 'Bytes held in the upload store')
+metrics.gauge('climb_upload_bytes', lambda: upload_store.snapshot()['bytes'])
+
+@app.before_request
+def start_timer():
+    g.timings = StageTimings()
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_timings(response):
+    """Attach Server-Timing and feed the latency histograms and counters"""
+    timings = getattr(g, 'timings', None)
+    if timings is None:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+
+    timings.add('total', elapsed)
+    response.headers['Server-Timing'] = timings.header()
+
+    metrics.inc('climb_requests_total', endpoint=endpoint, status=str(response.status_code))
+    metrics.inc('climb_request_bytes_total', request.content_length or 0, endpoint=endpoint)
+    if not response.is_streamed:
+        metrics.inc('climb_response_bytes_total', response.calculate_content_length() or 0, endpoint=endpoint)
+    metrics.observe('climb_request_duration_seconds', elapsed, endpoint=endpoint)
+    for stage, seconds in timings.stages.items():
+        if stage != 'total':
+            metrics.observe('climb_stage_duration_seconds', seconds, stage=stage)
+    return response
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify({"error": f"Upload larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"}), 413
 
 @app.route('/')
 def index():
@@ -29,70 +166,502 @@ def analyze_route():
     """
     Analyze a climbing wall image and return route suggestions
     
-    Expects a JSON payload with:
-    {
-        "image": "base64 encoded image data" or null if using demo image,
-        "useDemo": true/false
-    }
+    Accepts any of:
+    - multipart/form-data with the photo in an "image" file field
+    - a raw request body with an image/* or application/octet-stream
+      Content-Type (options such as useDemo go in the query string)
+    - a JSON payload (kept for compatibility):
+      {
+          "image": "base64 encoded image data" or null if using demo image,
+          "useDemo": true/false
+      }
+    
+    An optional "k" (form field, query parameter or JSON key) adds up to k
+    "alternatives" routes, ranked by cost, to the response; the one marked
+    "main": true is the route the instructions describe.
+    
+    The response is the verbose route JSON unless the Accept header asks
+    for application/vnd.climb.compact+json or +msgpack (see wire_format);
+    gzip/br Accept-Encoding compresses it.
     """
-    data = request.json
+    try:
+        data, image_bytes = read_upload()
+        params = analysis_params(data)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
     
     # Handle demo mode
-    if data.get('useDemo', False):
-        # Use the predefined image and route
-        analyzer = ClimbingRouteAnalyzer()
-        route_data = analyzer.analyze_image_and_generate_route()
-        
-        # Create route data JSON
-        route_json = {
-            "route_info": {
-                "total_steps": len(route_data),
-                "difficulty": "intermediate",
-                "image": "demo_image"
-            },
-            "holds": analyzer.holds,
-            "instructions": route_data
-        }
+    if str(data.get('useDemo', False)).lower() in ('true', '1'):
+        cache_key = analysis_cache.key(DEMO_CACHE_KEY_BYTES, params)
+        with g.timings.stage('cache'):
+            route_json = lookup_analysis(cache_key)
+        if route_json is None:
+            # Use the predefined image and route
+            route_json = run_analysis(None, "demo_image", params)
+            with g.timings.stage('store'):
+                remember_analysis(cache_key, route_json, "demo_image")
         
-        return jsonify(route_json)
+        with g.timings.stage('serialize'):
+            return route_response(route_json)
     
     # Handle image upload
-    if 'image' in data and data['image']:
-        # Extract the base64 image data
-        image_data = data['image'].split(',')[1] if ',' in data['image'] else data['image']
-        
-        # Save the image to a temporary file
-        image_filename = f"climbing_wall_{int(time.time())}.jpg"
-        image_path = os.path.join(UPLOAD_FOLDER, image_filename)
-        
-        with open(image_path, "wb") as f:
-            f.write(base64.b64decode(image_data))
+    if image_bytes:
+        # Identical photo + parameters (now or in an earlier run): serve the stored result
+        with g.timings.stage('cache'):
+            cache_key = analysis_cache.key(image_bytes, params)
+            route_json = lookup_analysis(cache_key)
+        if route_json is not None:
+            # Still serve the photo from /uploads, restoring it if it was evicted
+            keep_upload(image_bytes)
+        else:
+            try:
+                image = decode_upload(image_bytes)
+            except ValueError as exc:
+                return jsonify({"error": str(exc)}), 400
+            
+            # Keep a copy so /uploads can serve it; analysis works from memory
+            image_filename = save_upload(image_bytes)
+            
+            # Analyze the image
+            route_json = run_analysis(image, image_filename, params)
+            with g.timings.stage('store'):
+                remember_analysis(cache_key, route_json, image_filename)
         
-        # Analyze the image
-        analyzer = ClimbingRouteAnalyzer()
-        route_data = analyzer.analyze_image_and_generate_route(image_path)
-        
-        # Create route data JSON
-        route_json = {
-            "route_info": {
-                "total_steps": len(route_data),
-                "difficulty": "intermediate",
-                "image": image_filename
-            },
-            "holds": analyzer.holds,
-            "instructions": route_data
-        }
-        
-        return jsonify(route_json)
+        with g.timings.stage('serialize'):
+            return route_response(route_json)
     
     return jsonify({"error": "No image provided"}), 400
 
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_route_stream():
+    """
+    Streaming variant of /analyze using Server-Sent Events
+    
+    Takes the same payloads as /analyze and emits one event per finished
+    stage so the page can paint holds before the route is planned:
+    "holds", "route", "instructions", then "result" carrying the same JSON
+    that /analyze returns.  Malformed uploads are still refused with a
+    400 before the stream starts; a failure during the analysis ends the
+    stream with an "error" event carrying {"error": message}.
+    """
+    try:
+        data, image_bytes = read_upload()
+        params = analysis_params(data)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    
+    demo = str(data.get('useDemo', False)).lower() in ('true', '1')
+    if demo:
+        cache_key = analysis_cache.key(DEMO_CACHE_KEY_BYTES, params)
+        image, image_name = None, "demo_image"
+    elif image_bytes:
+        cache_key = analysis_cache.key(image_bytes, params)
+    else:
+        return jsonify({"error": "No image provided"}), 400
+    
+    route_json = lookup_analysis(cache_key)
+    if not demo:
+        if route_json is not None:
+            image_name = keep_upload(image_bytes)
+        else:
+            try:
+                image = decode_upload(image_bytes)
+            except ValueError as exc:
+                return jsonify({"error": str(exc)}), 400
+            image_name = save_upload(image_bytes)
+    
+    if route_json is not None:
+        # The "route" event carries the planner's steps: step, hold_id, then the hold's fields
+        route = [dict({"step": ins["step"], "hold_id": ins["hold"]["id"]},
+                      **{k: v for k, v in ins["hold"].items() if k != "id"})
+                 for ins in route_json["instructions"]]
+        events = [("holds", route_json["holds"]),
+                  ("route", route),
+                  ("instructions", route_json["instructions"]),
+                  ("result", route_json)]
+    else:
+        events = stream_route_json(image, image_name, wall_index=get_wall_index(), **params)
+    
+    def generate():
+        try:
+            for event, payload in events:
+                if event == "result" and route_json is None:
+                    remember_analysis(cache_key, payload, image_name)
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as exc:
+            # Headers are already sent: report the failure in-band so the page can stop waiting
+            app.logger.exception("Streaming analysis failed")
+            yield f"event: error\ndata: {json.dumps({'error': f'Analysis failed: {exc}'})}\n\n"
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let proxies batch events
+    return response
+
+def read_upload():
+    """Return (options dict, image bytes or None) for any supported upload style
+
+    Raises ValueError for a malformed body.
+    """
+    with g.timings.stage('receive'):
+        if 'image' in request.files:
+            return request.form.to_dict(), request.files['image'].read()
+
+        if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+            # Stream the raw body into one buffer instead of materialising it twice
+            buf = bytearray()
+            while True:
+                chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                buf += chunk
+            return request.args.to_dict(), bytes(buf)
+
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            raise ValueError("JSON body must be an object")
+
+    if data.get('image'):
+        if not isinstance(data['image'], str):
+            raise ValueError("image must be a base64 string")
+        with g.timings.stage('b64decode'):
+            # Extract the base64 image data
+            image_data = data['image'].split(',', 1)[1] if ',' in data['image'] else data['image']
+            try:
+                return data, base64.b64decode(image_data)
+            except (binascii.Error, ValueError):
+                raise ValueError("image is not valid base64")
+    return data, None
+
+def decode_upload(image_bytes):
+    """Decoded image for uploaded bytes, so corrupt uploads are refused before
+    they are stored or analysed; raises ValueError if they do not decode.
+    Returns the bytes unchanged when OpenCV is not installed."""
+    try:
+        from image_io import decode_image
+    except ImportError:
+        return image_bytes
+    with g.timings.stage('decode'):
+        return decode_image(image_bytes)
+
+def save_upload(image_bytes):
+    """Store an uploaded image in the upload store and return its filename"""
+    with g.timings.stage('write'):
+        return upload_store.save(image_bytes)
+
+def keep_upload(image_bytes):
+    """Filename of an upload whose analysis was cached, writing the image
+    again only if it has been evicted from the upload store"""
+    with g.timings.stage('write'):
+        name = upload_name(image_bytes)
+        if upload_store.path(name) is None:
+            name = upload_store.save(image_bytes)
+        return name
+
+def analysis_params(data):
+    """Request fields that change the analysis result (part of the cache key),
+    as keyword arguments for analyze_to_route_json
+
+    Raises ValueError for invalid values.
+    """
+    params = {}
+    if data.get('k') not in (None, ''):
+        try:
+            k = int(data['k'])
+        except (TypeError, ValueError):
+            raise ValueError("k must be an integer")
+        if not 1 <= k <= MAX_ALTERNATIVES:
+            raise ValueError(f"k must be between 1 and {MAX_ALTERNATIVES}")
+        if k > 1:
+            params['k'] = k
+    return params
+
+def get_wall_index():
+    """The shared WallIndex, created on first use so OpenCV is not imported at
+    startup; None when OpenCV is not installed"""
+    global wall_index
+    with wall_index_lock:
+        if wall_index is None:
+            try:
+                from wall_index import WallIndex
+            except ImportError:  # OpenCV not installed: no near-duplicate wall recognition
+                wall_index = False
+            else:
+                wall_index = WallIndex()
+    return wall_index if wall_index is not False else None
+
+def get_overlay_renderer():
+    """The shared OverlayRenderer, created on first use like the wall index;
+    None when OpenCV is not installed"""
+    global overlay_renderer
+    with overlay_renderer_lock:
+        if overlay_renderer is None:
+            try:
+                from route_render import OverlayRenderer
+            except ImportError:
+                overlay_renderer = False
+            else:
+                overlay_renderer = OverlayRenderer(max_images=RENDER_CACHE_IMAGES,
+                                                   max_render_bytes=RENDER_CACHE_BYTES)
+    return overlay_renderer or None
+
+def route_steps(route_json, route):
+    """Overlay steps for "main" or an alternative's rank; None if there is no such route"""
+    if route == 'main':
+        return [{"step": ins["step"], "x": ins["hold"]["x"], "y": ins["hold"]["y"]}
+                for ins in route_json.get("instructions", [])]
+    for alt in route_json.get("alternatives", []):
+        if str(alt["rank"]) == route:
+            return alt["route"]
+    return None
+
+def lookup_analysis(cache_key):
+    """Route JSON from the analysis cache or, failing that, the route store"""
+    route_json = analysis_cache.get(cache_key)
+    store = get_route_store()
+    if route_json is None and store is not None:
+        route_json = store.load_analysis(cache_key)
+        if route_json is not None:
+            analysis_cache.put(cache_key, route_json)
+    return route_json
+
+def remember_analysis(cache_key, route_json, image_name):
+    """Keep a fresh result in the analysis cache and the route store"""
+    analysis_cache.put(cache_key, route_json)
+    store = get_route_store()
+    if store is not None:
+        store.save_analysis(cache_key, route_json, image=image_name)
+
+def route_response(route_json):
+    """Response for a route JSON in the representation the Accept header
+    prefers (verbose JSON by default), compressed per Accept-Encoding"""
+    mimetype = request.accept_mimetypes.best_match(wire_format.available_types(),
+                                                   default=wire_format.VERBOSE_JSON)
+    if mimetype == wire_format.VERBOSE_JSON:
+        response = jsonify(route_json)
+    else:
+        body, mimetype = wire_format.encode(route_json, mimetype)
+        response = Response(body, mimetype=mimetype)
+    body, encoding = wire_format.compress(response.get_data(), request.headers.get('Accept-Encoding'))
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+def run_analysis(image, image_name, params):
+    """Run the full analysis pipeline and build the route JSON
+
+    image may be None (demo), a path, the uploaded bytes or the decoded image.  Stage timings
+    are added to the current request's timings.
+    """
+    stages = {}
+    route_json = analyze_to_route_json(image, image_name, wall_index=get_wall_index(), timings=stages, **params)
+    g.timings.update(stages)
+    return route_json
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue an analysis and return a job id straight away
+    
+    Takes the same payloads as /analyze.  Responds 202 with the job id and
+    its status/result URLs, or 429 when the job queue is full.
+    """
+    try:
+        data, image_bytes = read_upload()
+        params = analysis_params(data)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    
+    demo = str(data.get('useDemo', False)).lower() in ('true', '1')
+    if demo:
+        cache_key = analysis_cache.key(DEMO_CACHE_KEY_BYTES, params)
+        args = (None, "demo_image")
+    elif image_bytes:
+        cache_key = analysis_cache.key(image_bytes, params)
+    else:
+        return jsonify({"error": "No image provided"}), 400
+    
+    route_json = lookup_analysis(cache_key)
+    if route_json is not None:
+        if not demo:
+            keep_upload(image_bytes)
+        job_id = job_queue.completed(route_json)
+    else:
+        if not demo:
+            try:
+                decode_upload(image_bytes)  # the worker decodes it again; this only refuses bad uploads
+            except ValueError as exc:
+                return jsonify({"error": str(exc)}), 400
+            args = (image_bytes, save_upload(image_bytes))
+        try:
+            # Worker processes have no shared wall index; the cache and store still fill
+            job_id = job_queue.submit(partial(analyze_to_route_json, **params), *args,
+                                      on_done=lambda result: remember_analysis(cache_key, result, args[1]))
+        except QueueFull:
+            response = jsonify({"error": "Analysis queue is full, try again shortly"})
+            response.headers['Retry-After'] = '5'
+            return response, 429
+    
+    return jsonify({
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result"
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report whether a job is queued, running, done or failed"""
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    status["queue_depth"] = job_queue.depth()
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Return the route JSON of a finished job (202 while it is still pending)"""
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if status["status"] in ("queued", "running"):
+        return jsonify(status), 202
+    if status["status"] == "failed":
+        return jsonify(status), 500
+    return route_response(job_queue.result(job_id))
+
+@app.route('/render/<path:filename>')
+def render_route(filename):
+    """
+    An uploaded photo, resized and encoded server-side, with a route drawn on it
+    
+    Query parameters:
+    - route: "main" (default), the rank of an alternative, or "none" for a
+      plain thumbnail
+    - k: the k the photo was analysed with, to find its alternatives (the
+      main route is found under any k)
+    - size: longest side in pixels (default: full size)
+    - format: "jpeg" (default) or "webp"; quality: 1-100
+    
+    The photo must have been analysed with /analyze first (unless route=none).
+    Responses are immutable, with a strong ETag for conditional GETs.
+    """
+    route = request.args.get('route', 'main')
+    fmt = request.args.get('format', 'jpeg').lower().replace('jpg', 'jpeg')
+    try:
+        params = analysis_params(request.args)
+        size = int(request.args['size']) if request.args.get('size') else None
+        quality = int(request.args.get('quality', 85))
+        if size is not None and not 16 <= size <= RENDER_MAX_SIDE:
+            raise ValueError(f"size must be between 16 and {RENDER_MAX_SIDE}")
+        if not 1 <= quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        if fmt not in ('jpeg', 'webp'):
+            raise ValueError("format must be jpeg or webp")
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    
+    # Same upload and parameters always give the same bytes
+    etag = hashlib.sha256(json.dumps([filename, params, route, size, fmt, quality]).encode()).hexdigest()
+    if request.if_none_match.contains(etag) and upload_store.path(filename) is not None:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    renderer = get_overlay_renderer()
+    if renderer is None:
+        return jsonify({"error": "Rendering needs OpenCV on the server"}), 501
+    path = upload_store.path(filename)
+    if path is None:
+        return jsonify({"error": "Unknown upload"}), 404
+    
+    steps = None
+    if route != 'none':
+        with g.timings.stage('cache'):
+            with open(path, 'rb') as f:
+                image_bytes = f.read()
+            route_json = lookup_analysis(analysis_cache.key(image_bytes, params))
+            if route_json is None and route == 'main':
+                # The main route does not depend on k, so any analysis of the photo will do
+                for k in range(1, MAX_ALTERNATIVES + 1):
+                    other = {'k': k} if k > 1 else {}
+                    if other != params:
+                        route_json = lookup_analysis(analysis_cache.key(image_bytes, other))
+                        if route_json is not None:
+                            break
+        if route_json is None:
+            return jsonify({"error": "Image not analysed with these parameters; POST it to /analyze first"}), 404
+        steps = route_steps(route_json, route)
+        if steps is None:
+            return jsonify({"error": f"No route {route!r} in the analysis"}), 404
+    
+    with g.timings.stage('render'):
+        data, mimetype = renderer.render(filename, path, steps, max_side=size, fmt=fmt,
+                                         quality=quality, route_key=(route, params.get('k', 1)))
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = UPLOAD_CACHE_SECONDS
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/walls')
+def list_walls():
+    """Walls in the route store"""
+    store = get_route_store()
+    if store is None:
+        return jsonify({"error": "Route store disabled"}), 404
+    return jsonify(store.walls())
+
+@app.route('/walls/<int:wall_id>/holds')
+def wall_holds(wall_id):
+    """Holds of a stored wall inside the box given by x0, y0, x1, y1 (default: all)"""
+    store = get_route_store()
+    if store is None:
+        return jsonify({"error": "Route store disabled"}), 404
+    try:
+        box = [float(request.args.get(name, default))
+               for name, default in (('x0', '-inf'), ('y0', '-inf'), ('x1', 'inf'), ('y1', 'inf'))]
+    except ValueError:
+        return jsonify({"error": "x0, y0, x1, y1 must be numbers"}), 400
+    return jsonify(store.holds_in_region(*box, wall_id=wall_id))
+
+@app.route('/walls/<int:wall_id>/holds/<int:hold_id>/routes')
+def hold_routes(wall_id, hold_id):
+    """Stored routes of a wall that use the given hold"""
+    store = get_route_store()
+    if store is None:
+        return jsonify({"error": "Route store disabled"}), 404
+    return jsonify(store.routes_through_hold(wall_id, hold_id))
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Report analysis cache hit/miss counters"""
+    return jsonify(analysis_cache.snapshot())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    """Serve uploaded images"""
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    """Serve uploaded images with a strong ETag (304 on If-None-Match)"""
+    path = upload_store.path(filename)
+    if path is None:
+        abort(404)
+    etag = upload_store.etag(filename)
+    if etag is None:  # not content-addressed (saved by an older version)
+        return send_file(path, conditional=True)
+    response = send_file(path, etag=etag, conditional=True, max_age=UPLOAD_CACHE_SECONDS)
+    response.cache_control.immutable = True
+    return response
 
 if __name__ == '__main__':
     print("Starting Climbing Route Analyzer Server...")
     print("Open your browser to http://localhost:5000")
-    app.run(debug=True, host='0.0.0.0') 
\ No newline at end of file
+    print("(development server; use 'python wsgi.py' for production serving)")
+    app.run(debug=True, host='0.0.0.0', threaded=True) 
\ No newline at end of file
@@ -38,9 +38,10 @@ def generate_predefined_route():
     route_ids = [1, 2, 3, 4, 5, 6, 7, 8, 10]
     
     # Convert to route steps
+    holds_by_id = {h["id"]: h for h in holds}
     steps = []
     for idx, hold_id in enumerate(route_ids):
-        hold = next(h for h in holds if h["id"] == hold_id)
+        hold = holds_by_id[hold_id]
         steps.append({
             "step": idx + 1,
             "x": hold["x"],
@@ -103,28 +104,38 @@ def create_text_visualization(steps, width=80, height=40):
     return visualization
 
 if __name__ == "__main__":
-    import sys
+    import argparse
+    from profiling import Profiler
     
-    # Get the output filename
-    output_file = "route.json"
-    if len(sys.argv) > 1:
-        output_file = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Generate a climbing route from predefined holds")
+    parser.add_argument("output_file", nargs="?", default="route.json", help="Where to save the route JSON")
+    parser.add_argument("--profile", nargs="?", const="simple_route_profile", default=None, metavar="PREFIX",
+                        help="Write a CPU profile, per-stage peak memory and a collapsed-stack file to PREFIX.*")
+    args = parser.parse_args()
+    output_file = args.output_file
     
-    # Generate route with predefined holds
-    steps = generate_predefined_route()
-    
-    # Save to JSON
-    with open(output_file, "w") as f:
-        json.dump(steps, f, indent=2)
-    
-    print(f"Route with {len(steps)} moves saved to {output_file}")
-    
-    # Create and display text visualization
-    vis = create_text_visualization(steps)
+    prof = Profiler(args.profile, enabled=args.profile is not None)
+    with prof:
+        # Generate route with predefined holds
+        with prof.stage("generate"):
+            steps = generate_predefined_route()
+        
+        # Save to JSON
+        with prof.stage("save_json"):
+            with open(output_file, "w") as f:
+                json.dump(steps, f, indent=2)
+        
+        print(f"Route with {len(steps)} moves saved to {output_file}")
+        
+        # Create and display text visualization
+        with prof.stage("visualize"):
+            vis = create_text_visualization(steps)
     print("\nRoute Visualization:")
     print(vis)
     
     # Print detailed instructions
     print("\nClimbing Route Instructions:")
     for step in steps:
-        print(step["instruction"]) 
\ No newline at end of file
+        print(step["instruction"])
+    
+    prof.report()
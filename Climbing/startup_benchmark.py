@@ -0,0 +1,97 @@
+"""startup_benchmark.py
+Import-cost benchmark for the server's startup path.
+
+Every module is imported in a fresh interpreter with ``python -X importtime``,
+so nothing is already cached in sys.modules.  For each one the report gives:
+- its cumulative import time, best of --repeat runs
+- its own (self) time
+- the direct imports that cost the most
+
+It also times a bare ``import server`` against one with CLIMB_PRELOAD=1
+(see warmup.py), to show what the preload hook moves to startup.
+
+Usage:
+    python startup_benchmark.py
+    python startup_benchmark.py route_analyzer wall_index --repeat 5 --out startup.json
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+DEFAULT_MODULES = ["server", "route_analyzer", "route_store", "job_queue", "hold_set",
+                   "image_io", "wall_index", "route_planner_backend", "flask", "numpy", "cv2", "networkx"]
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr):
+    """[(depth, module, self µs, cumulative µs)] from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append(((len(name) - len(name.lstrip()) - 1) // 2, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_cost(module, env=None):
+    """Import module in a fresh interpreter; returns (self µs, cumulative µs, top children)"""
+    # Keep the server from opening a route store in the source directory
+    env = dict(os.environ, ROUTE_STORE_PATH="") if env is None else env
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=HERE, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    rows = parse_importtime(result.stderr)
+    # The requested module is the last top-level row; its direct imports are
+    # the depth-1 rows that follow the previous top-level row
+    end = max(i for i, row in enumerate(rows) if row[0] == 0 and row[1] == module)
+    start = max([i for i, row in enumerate(rows[:end]) if row[0] == 0], default=-1) + 1
+    children = sorted((row for row in rows[start:end] if row[0] == 1), key=lambda r: -r[3])
+    return rows[end][2], rows[end][3], [(name, cum) for _, name, _, cum in children[:3]]
+
+
+def run(modules, repeat):
+    results = []
+    for module in modules:
+        try:
+            runs = [import_cost(module) for _ in range(repeat)]
+        except ImportError as exc:
+            print(f"{module:<24}not importable: {exc}")
+            continue
+        self_us, cumulative_us, children = min(runs, key=lambda r: r[1])
+        results.append({"module": module, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000,
+                        "top_imports": [{"module": name, "ms": cum / 1000} for name, cum in children]})
+        heaviest = ", ".join(f"{name} {cum / 1000:.0f}" for name, cum in children)
+        print(f"{module:<24}{cumulative_us / 1000:>10.1f} ms  (self {self_us / 1000:.1f} ms; {heaviest})")
+
+    preload = {}
+    for label, value in (("import server", ""), ("import server, CLIMB_PRELOAD=1", "1")):
+        env = dict(os.environ, CLIMB_PRELOAD=value, ROUTE_STORE_PATH="")
+        try:
+            best = min(import_cost("server", env)[1] for _ in range(repeat))
+        except ImportError as exc:
+            print(f"{label}: not importable: {exc}")
+            continue
+        preload[label] = best / 1000
+        print(f"{label:<34}{best / 1000:>10.1f} ms")
+    return {"python": sys.version.split()[0], "repeat": repeat, "modules": results, "server": preload}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure import cost of the server's modules")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module (best is kept)")
+    parser.add_argument("--out", default=None, help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    print(f"{'module':<24}{'cumulative':>13}")
+    report = run(args.modules, args.repeat)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.out}")
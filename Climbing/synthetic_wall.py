@@ -0,0 +1,97 @@
+"""synthetic_wall.py
+Seeded generator of synthetic climbing-wall images with holds at known positions.
+
+Used by benchmark.py to time the pipelines at controlled resolutions and hold
+densities, and handy for checking detection accuracy against ground truth.
+
+Usage:
+    from synthetic_wall import generate_wall
+    img, holds = generate_wall(200, width=1600, height=2400, seed=1)
+
+    python synthetic_wall.py 200 --size 1600x2400 --out wall.jpg
+"""
+
+import random
+
+import cv2
+import numpy as np
+
+# BGR colours whose hues fall inside the detector's colour ranges
+HOLD_COLORS = {
+    "green": (40, 180, 30),
+    "blue": (200, 80, 20),
+    "orange": (20, 130, 240),
+    "red": (30, 20, 210),
+}
+HOLD_TYPES = ["jug", "crimp", "pinch", "sloper"]
+MIN_HOLD_RADIUS = 7  # keeps every hold above the detector's noise threshold
+
+
+def generate_wall(n_holds, width=800, height=1200, seed=0):
+    """Render a wall with n_holds non-overlapping round holds.
+
+    Returns (img, holds): a BGR image and the ground-truth holds as dicts with
+    the analyzer's fields (id, x, y, w, h, color, size, type).  Hold radius
+    shrinks with density so that every hold fits without touching another.
+    """
+    rng = random.Random(seed)
+    noise = np.random.default_rng(seed)
+
+    # Grey, low-saturation wall texture that the colour ranges ignore
+    img = np.full((height, width, 3), 170, dtype=np.uint8)
+    img = cv2.add(img, noise.integers(0, 25, size=(height, width, 1), dtype=np.uint8).repeat(3, axis=2))
+
+    # Radius such that the holds cover roughly a fifth of the wall
+    radius = int(np.sqrt(0.2 * width * height / (np.pi * max(n_holds, 1))))
+    radius = max(MIN_HOLD_RADIUS, min(radius, min(width, height) // 20))
+    gap = radius * 2 + 4
+
+    # Place holds on a jittered grid of free cells so they never overlap
+    cols = max(1, (width - 2 * radius) // gap)
+    rows = max(1, (height - 2 * radius) // gap)
+    cells = [(r, c) for r in range(rows) for c in range(cols)]
+    if n_holds > len(cells):
+        raise ValueError(f"{n_holds} holds do not fit on a {width}x{height} wall")
+    chosen = rng.sample(cells, n_holds)
+
+    holds = []
+    for hold_id, (r, c) in enumerate(sorted(chosen, reverse=True)):  # bottom of the wall first
+        hold_r = rng.randint(max(MIN_HOLD_RADIUS, radius * 2 // 3), radius)
+        slack = radius - hold_r
+        x = radius + c * gap + gap // 2 + rng.randint(-slack, slack)
+        y = radius + r * gap + gap // 2 + rng.randint(-slack, slack)
+        x = min(max(x, hold_r), width - hold_r - 1)
+        y = min(max(y, hold_r), height - hold_r - 1)
+        color = rng.choice(list(HOLD_COLORS))
+        cv2.circle(img, (x, y), hold_r, HOLD_COLORS[color], -1)
+        holds.append({
+            "id": hold_id,
+            "x": float(x),
+            "y": float(y),
+            "w": float(2 * hold_r + 1),
+            "h": float(2 * hold_r + 1),
+            "color": color,
+            "size": "small" if hold_r < radius * 0.8 else "medium",
+            "type": rng.choice(HOLD_TYPES),
+        })
+    return img, holds
+
+
+if __name__ == "__main__":
+    import argparse, json
+
+    parser = argparse.ArgumentParser(description="Render a synthetic climbing wall")
+    parser.add_argument("holds", type=int, help="Number of holds")
+    parser.add_argument("--size", default="800x1200", help="WIDTHxHEIGHT in pixels")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="synthetic_wall.jpg", help="Image path")
+    parser.add_argument("--holds_out", default=None, help="Optional JSON file for the ground-truth holds")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    img, holds = generate_wall(args.holds, width, height, seed=args.seed)
+    cv2.imwrite(args.out, img)
+    print(f"Wall with {len(holds)} holds saved to {args.out}")
+    if args.holds_out:
+        with open(args.holds_out, "w") as f:
+            json.dump(holds, f, indent=2)
@@ -0,0 +1,23 @@
+"""
+Shared pytest setup: the modules under test live in the parent directory
+(run ``python -m pytest`` from Climbing/).
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_holds():
+    """Factory for n random holds on a width x height wall, reproducible by seed"""
+    def make(n, seed=0, width=1000, height=1500):
+        rng = random.Random(seed)
+        return [{"id": i, "x": rng.uniform(0, width), "y": rng.uniform(0, height),
+                 "color": rng.choice(["red", "green", "blue"]), "type": "jug", "size": "medium"}
+                for i in range(n)]
+    return make
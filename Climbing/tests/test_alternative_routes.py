@@ -0,0 +1,63 @@
+"""Top-k alternative routes against networkx's k shortest simple paths"""
+
+from itertools import islice
+
+import networkx as nx
+import pytest
+
+from route_analyzer import ClimbingRouteAnalyzer
+from route_planner_backend import (build_hold_graph, build_sparse_hold_graph, find_optimal_route,
+                                   find_optimal_routes, route_endpoints)
+
+SOURCE, SINK = "source", "sink"
+
+
+def reference_costs(G, k):
+    """Costs of the k cheapest start-to-top paths, via a super source and sink"""
+    sources, tops = route_endpoints(G)
+    H = G.copy()
+    H.add_edges_from(((SOURCE, s) for s in sources), weight=0.0)
+    H.add_edges_from(((t, SINK) for t in tops), weight=0.0)
+    paths = islice(nx.shortest_simple_paths(H, SOURCE, SINK, weight="weight"), k)
+    return [nx.path_weight(H, path, "weight") for path in paths]
+
+
+def path_cost(G, path):
+    return sum(G.edges[u, v]["weight"] for u, v in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("seed, k", [(0, 1), (1, 5), (2, 10), (3, 25)])
+def test_costs_match_networkx(make_holds, seed, k):
+    G = build_sparse_hold_graph(make_holds(40, seed), reach=500)
+
+    routes = find_optimal_routes(G, k)
+
+    expected = reference_costs(G, k)
+    assert [r["cost"] for r in routes] == pytest.approx(expected)
+    assert [r["rank"] for r in routes] == list(range(1, len(expected) + 1))
+    assert len({tuple(r["route"]) for r in routes}) == len(routes)
+    for r in routes:
+        assert path_cost(G, r["route"]) == pytest.approx(r["cost"])
+
+
+def test_rank_one_is_the_optimal_route(make_holds):
+    G = build_hold_graph(make_holds(25, seed=5))
+
+    best = find_optimal_routes(G, 3)[0]
+
+    assert best["cost"] == pytest.approx(path_cost(G, find_optimal_route(G)))
+
+
+def test_analyzer_alternatives_are_ranked_by_cost_and_include_the_main_route():
+    analyzer = ClimbingRouteAnalyzer()
+    analyzer.identify_holds_from_image()
+    analyzer.plan_route()
+
+    routes = analyzer.plan_alternative_routes(k=4)
+
+    assert [r["rank"] for r in routes] == list(range(1, len(routes) + 1))
+    costs = [r["cost"] for r in routes]
+    assert costs == sorted(costs)
+    main = [r for r in routes if r["main"]]
+    assert len(main) == 1 and main[0]["route"] == analyzer.route
+    assert all(r["route"] != analyzer.route for r in routes if not r["main"])
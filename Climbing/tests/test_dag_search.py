@@ -0,0 +1,45 @@
+"""DAG shortest paths against networkx's general-purpose search"""
+
+import networkx as nx
+import pytest
+
+from route_planner_backend import (build_hold_graph, dag_shortest_paths, find_optimal_route,
+                                   route_endpoints)
+
+
+def path_cost(G, path):
+    return sum(G.edges[u, v]["weight"] for u, v in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_distances_match_networkx(make_holds, seed):
+    G = build_hold_graph(make_holds(40, seed))
+    sources, _ = route_endpoints(G)
+
+    dist, pred = dag_shortest_paths(G, sources)
+
+    expected = nx.multi_source_dijkstra_path_length(G, set(sources))
+    assert dist.keys() == expected.keys()
+    for node, cost in expected.items():
+        assert dist[node] == pytest.approx(cost)
+    # Every predecessor lies on a shortest path
+    for node, parent in pred.items():
+        if parent is not None:
+            assert dist[parent] + G.edges[parent, node]["weight"] == pytest.approx(dist[node])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_route_matches_networkx_all_pairs(make_holds, seed):
+    G = build_hold_graph(make_holds(30, seed))
+    sources, tops = route_endpoints(G)
+
+    route = find_optimal_route(G)
+
+    all_pairs = dict(nx.all_pairs_dijkstra_path_length(G))
+    best = min(all_pairs[s][t] for s in sources for t in tops if t in all_pairs[s])
+    assert route[0] in sources and route[-1] in tops
+    assert path_cost(G, route) == pytest.approx(best)
+
+
+def test_empty_graph_has_no_route():
+    assert find_optimal_route(build_hold_graph([])) == []
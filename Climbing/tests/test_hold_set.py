@@ -0,0 +1,37 @@
+"""HoldSet dict views against the dicts it was built from"""
+
+import tracemalloc
+
+from hold_set import HoldSet
+
+
+def sample_holds(n):
+    return [{"id": i * 3, "x": 10 * i, "y": 2.5 * i, "w": 30, "h": 20.0, "area": 600,
+             "color": ("red", "blue")[i % 2], "type": "jug", "size": "small",
+             **({"note": "chipped"} if i % 5 == 0 else {})} for i in range(n)]
+
+
+def test_round_trip_keeps_keys_and_types():
+    holds = sample_holds(50)
+    holds[7].pop("color")
+
+    hs = HoldSet.from_dicts(holds)
+
+    assert hs.to_dicts() == holds
+    assert list(hs) == holds
+    assert [type(v) for v in hs.by_id(21).values()] == [type(v) for v in holds[7].values()]
+    assert hs[-1] == holds[-1]
+    assert all(hs.by_id(h["id"]) == h for h in holds)
+
+
+def test_lookups_do_not_grow_the_set():
+    hs = HoldSet.from_dicts(sample_holds(2000))
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for hold_id in hs.ids.tolist():
+            hs.by_id(hold_id)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert after - before < 20 * len(hs)  # bytes per hold
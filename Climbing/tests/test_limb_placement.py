@@ -0,0 +1,79 @@
+"""Limb-placement DP against brute force over every limb sequence"""
+
+import itertools
+import math
+import random
+
+import pytest
+
+import route_analyzer as ra
+from route_analyzer import ClimbingRouteAnalyzer
+
+
+def sequence_cost(points, sequence):
+    """Total cost of a limb sequence under the analyzer's cost model, or None
+    if any move breaks the arm, leg or body span"""
+    x0, y0 = points[0]
+    ground = {2: (x0 - ra.FOOT_SPACING / 2, y0 + ra.GROUND_OFFSET),
+              3: (x0 + ra.FOOT_SPACING / 2, y0 + ra.GROUND_OFFSET)}
+    at = {0: points[0], 1: points[1], 2: ground[2], 3: ground[3]}
+    total = 0.0
+    for i, limb in enumerate(sequence[2:], start=2):
+        moved_from = at[limb]
+        at[limb] = points[i]
+        arm, leg = math.dist(at[0], at[1]), math.dist(at[2], at[3])
+        if (arm > ra.MAX_ARM_SPAN or leg > ra.MAX_LEG_SPAN
+                or any(math.dist(hand, foot) > ra.MAX_BODY_SPAN for hand in (at[0], at[1])
+                       for foot in (at[2], at[3]))):
+            return None
+        cost = math.dist(moved_from, points[i]) + ra.SPREAD_WEIGHT * (arm + leg)
+        y = points[i][1]
+        if limb < 2 and y > max(at[2][1], at[3][1]):
+            cost += ra.HAND_BELOW_FOOT_PENALTY
+        if limb >= 2 and y < min(at[0][1], at[1][1]):
+            cost += ra.FOOT_ABOVE_HAND_PENALTY
+        if at[0][0] > at[1][0] + ra.CROSS_MARGIN:
+            cost += ra.CROSS_PENALTY
+        if at[2][0] > at[3][0] + ra.CROSS_MARGIN:
+            cost += ra.CROSS_PENALTY
+        total += cost
+    return total
+
+
+def random_route(n, seed, spacing):
+    """n holds climbing upward, each within `spacing` px of the previous one"""
+    rng = random.Random(seed)
+    x, y = 400.0, 1200.0
+    route = []
+    for i in range(n):
+        route.append({"step": i + 1, "hold_id": i, "x": x, "y": y,
+                      "color": "red", "size": "medium", "type": "jug"})
+        x += rng.uniform(-spacing, spacing)
+        y -= rng.uniform(0, spacing)
+    return route
+
+
+@pytest.mark.parametrize("n, seed, spacing", [(3, 0, 80), (5, 1, 120), (7, 2, 150), (8, 3, 150), (8, 4, 300)])
+def test_dp_matches_brute_force(n, seed, spacing):
+    analyzer = ClimbingRouteAnalyzer()
+    analyzer.route = random_route(n, seed, spacing)
+    points = [(step["x"], step["y"]) for step in analyzer.route]
+
+    sequence = analyzer._optimal_limb_sequence()
+
+    costs = [sequence_cost(points, (0, 1) + rest) for rest in itertools.product(range(4), repeat=n - 2)]
+    best = min(cost for cost in costs if cost is not None)
+    assert sequence[:2] == [0, 1]
+    assert sequence_cost(points, tuple(sequence)) == pytest.approx(best)
+
+
+def test_out_of_reach_route_still_gets_limbs():
+    analyzer = ClimbingRouteAnalyzer()
+    analyzer.route = random_route(4, seed=5, spacing=2000)
+    analyzer.holds = [{"id": step["hold_id"], **{k: step[k] for k in ("x", "y", "color", "size", "type")}}
+                      for step in analyzer.route]
+
+    steps = analyzer.suggest_limb_placements()
+
+    assert [step["limb"] for step in steps[:2]] == ["left_hand", "right_hand"]
+    assert all(step["limb"] in ra.LIMBS for step in steps)
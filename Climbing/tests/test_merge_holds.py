@@ -0,0 +1,21 @@
+"""Duplicate/fragment blob merging"""
+
+from route_planner_backend import _bbox, merge_duplicate_holds
+
+
+def blob(hold_id, x, y, w, h, color):
+    return {"id": hold_id, "x": x, "y": y, "w": w, "h": h, "area": w * h, "color": color}
+
+
+def test_fragments_merge_into_their_union_box_with_the_same_fields():
+    # One two-colour hold split into a red and a blue blob
+    red, blue = blob(0, 100, 100, 40, 40, "red"), blob(1, 130, 110, 40, 40, "blue")
+    other = blob(2, 400, 400, 40, 40, "red")
+
+    merged, removed = merge_duplicate_holds([red, blue, other])
+
+    assert removed == 1
+    hold = next(h for h in merged if h["id"] != 2)
+    assert hold.keys() == red.keys()
+    assert _bbox(hold) == (80, 80, 150, 130)
+    assert hold["area"] == red["area"] + blue["area"]
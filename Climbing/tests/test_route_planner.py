@@ -0,0 +1,64 @@
+"""Incremental RoutePlanner edits against rebuilding the graph from scratch"""
+
+import random
+
+import pytest
+
+from route_planner_backend import (RoutePlanner, build_sparse_hold_graph, dag_shortest_paths,
+                                   find_optimal_route, route_endpoints)
+
+
+def assert_matches_rebuild(planner):
+    holds = [dict(data) for _, data in planner.G.nodes(data=True)]
+    G = build_sparse_hold_graph(holds, reach=planner.reach, band=planner.band)
+    assert set(planner.G.edges) == set(G.edges)
+
+    sources, _ = route_endpoints(G)
+    dist, _ = dag_shortest_paths(G, sources)
+    assert planner.dist.keys() == dist.keys()
+    for node, cost in dist.items():
+        assert planner.dist[node] == pytest.approx(cost)
+
+    route = find_optimal_route(G)
+    if route:
+        assert planner.route_cost() == pytest.approx(dist[route[-1]])
+    else:
+        assert planner.route() == []
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_random_edits_match_a_full_rebuild(make_holds, seed):
+    rng = random.Random(seed)
+    planner = RoutePlanner(make_holds(80, seed), reach=300)
+    assert_matches_rebuild(planner)
+
+    for _ in range(40):
+        ids = list(planner.G.nodes)
+        edit = rng.choice(["add", "remove", "move"])
+        if edit == "add" or len(ids) < 5:
+            planner.add_hold({"x": rng.uniform(0, 1000), "y": rng.uniform(0, 1500), "color": "red"})
+        elif edit == "remove":
+            planner.remove_hold(rng.choice(ids))
+        else:
+            planner.move_hold(rng.choice(ids), rng.uniform(0, 1000), rng.uniform(0, 1500))
+        assert_matches_rebuild(planner)
+
+
+def test_editing_the_route_ends_updates_the_endpoints(make_holds):
+    planner = RoutePlanner(make_holds(50, seed=7), reach=400)
+    top = planner.route()[-1]
+
+    planner.remove_hold(top)
+    assert top not in planner.route()
+    assert_matches_rebuild(planner)
+
+    # A new highest hold becomes a top hold
+    new_id = planner.add_hold({"x": 500.0, "y": -100.0})
+    assert_matches_rebuild(planner)
+    assert new_id in planner._tops
+
+
+def test_adding_an_existing_id_is_rejected(make_holds):
+    planner = RoutePlanner(make_holds(10))
+    with pytest.raises(ValueError):
+        planner.add_hold({"id": 3, "x": 1.0, "y": 1.0})
@@ -0,0 +1,86 @@
+"""/analyze answers malformed uploads with 400"""
+
+import base64
+import io
+import os
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("flask")
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    """Test client for a server whose uploads go to a temporary directory"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("server"))
+    saved = {name: os.environ.get(name) for name in ("ROUTE_STORE_PATH", "CLIMB_PRELOAD")}
+    os.environ["ROUTE_STORE_PATH"] = ""
+    os.environ.pop("CLIMB_PRELOAD", None)
+    try:
+        import server
+        yield server.app.test_client()
+    finally:
+        os.chdir(cwd)
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@pytest.fixture(scope="module")
+def wall_jpeg():
+    from synthetic_wall import generate_wall
+    img, _ = generate_wall(12, 400, 300, 1)
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"data": {"image": (io.BytesIO(b"not an image"), "wall.jpg")}, "content_type": "multipart/form-data"},
+    {"data": b"\xff\xd8\xff truncated jpeg", "content_type": "image/jpeg"},
+    {"json": {"image": "data:image/jpeg;base64," + base64.b64encode(b"not an image").decode()}},
+    {"json": {"image": "data:image/jpeg;base64,abc"}},
+    {"json": {"image": 42}},
+    {"json": ["image"]},
+    {"json": {}},
+], ids=["multipart", "raw-body", "json-undecodable", "json-bad-base64", "json-not-string",
+        "json-list", "json-no-image"])
+def test_bad_upload_is_a_400(client, kwargs):
+    response = client.post("/analyze", **kwargs)
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_bad_upload_is_not_stored(client):
+    client.post("/analyze", data=b"not an image", content_type="image/jpeg")
+    assert not os.listdir("uploads")
+
+
+def test_good_upload_is_analysed(client, wall_jpeg):
+    payload = {"image": "data:image/jpeg;base64," + base64.b64encode(wall_jpeg).decode()}
+
+    response = client.post("/analyze", json=payload)
+
+    assert response.status_code == 200
+    assert response.get_json()["instructions"]
+    assert os.listdir("uploads") == [response.get_json()["route_info"]["image"]]
+
+
+@pytest.mark.parametrize("endpoint", ["/analyze/stream", "/jobs"])
+def test_other_endpoints_refuse_bad_uploads(client, endpoint):
+    response = client.post(endpoint, data=b"not an image", content_type="image/jpeg")
+    assert response.status_code == 400
+
+
+def test_only_stored_names_are_served(client, wall_jpeg):
+    with open(os.path.join("uploads", "climbing_wall_1700000000.jpg"), "wb") as f:
+        f.write(wall_jpeg)
+    with open(os.path.join("uploads", "0" * 64 + ".jpg.1234.tmp"), "wb") as f:
+        f.write(wall_jpeg)
+
+    legacy = client.get("/uploads/climbing_wall_1700000000.jpg")
+    assert legacy.status_code == 200 and legacy.data == wall_jpeg
+    assert client.get("/uploads/" + "0" * 64 + ".jpg.1234.tmp").status_code == 404
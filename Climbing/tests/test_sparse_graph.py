@@ -0,0 +1,81 @@
+"""Reach-bounded sparse hold graph against the dense graph"""
+
+import json
+import math
+import os
+import subprocess
+import sys
+
+import pytest
+
+import route_planner_backend
+from route_planner_backend import (build_hold_graph, build_route_graph, build_sparse_hold_graph,
+                                   default_reach, find_optimal_routes)
+from hold_set import HoldSet
+
+
+def reachable_edges(G, reach, band):
+    """Edges of the dense graph a climber with this reach and band can make"""
+    edges = set()
+    for u, v in G.edges:
+        src, dst = G.nodes[u], G.nodes[v]
+        dx, dy = dst["x"] - src["x"], dst["y"] - src["y"]
+        if abs(dx) <= band and math.hypot(dx, dy) <= reach:
+            edges.add((u, v))
+    return edges
+
+
+@pytest.mark.parametrize("seed, reach, band", [(0, 200, None), (1, 350, 120), (2, 90, 90), (3, None, None)])
+def test_edges_are_the_dense_edges_within_reach(make_holds, seed, reach, band):
+    holds = make_holds(120, seed)
+    dense = build_hold_graph(holds)
+
+    sparse = build_sparse_hold_graph(holds, reach=reach, band=band)
+
+    reach = reach if reach is not None else default_reach(holds)
+    band = band if band is not None else reach
+    assert set(sparse.edges) == reachable_edges(dense, reach, band)
+    for u, v, weight in sparse.edges(data="weight"):
+        assert weight == dense.edges[u, v]["weight"]
+    assert set(sparse.nodes) == set(dense.nodes)
+
+
+def test_hold_set_input_gives_the_same_graph(make_holds):
+    holds = make_holds(60, seed=4)
+
+    from_dicts = build_sparse_hold_graph(holds, reach=250)
+    from_set = build_sparse_hold_graph(HoldSet.from_dicts(holds), reach=250)
+
+    assert set(from_set.edges) == set(from_dicts.edges)
+
+
+@pytest.mark.parametrize("reach", [0, -50, float("nan")])
+def test_non_positive_reach_is_rejected(make_holds, reach):
+    with pytest.raises(ValueError, match="reach must be positive"):
+        build_sparse_hold_graph(make_holds(10), reach=reach)
+
+
+def test_default_reach_widens_until_a_route_exists(make_holds, monkeypatch):
+    # Holds in two clusters far apart: a short default reach cannot bridge them
+    holds = make_holds(20, seed=1, width=200, height=200)
+    holds += [dict(h, id=h["id"] + 100, y=h["y"] + 1300) for h in holds]
+    monkeypatch.setattr(route_planner_backend, "REACH_FRACTION", 0.1)
+    assert find_optimal_routes(build_sparse_hold_graph(holds), 1) == []
+
+    G = build_route_graph(holds)
+
+    assert find_optimal_routes(G, 1)
+    assert G.graph["reach"] > default_reach(holds)
+
+
+def test_default_cli_finds_a_route_on_the_sample_wall(tmp_path):
+    pytest.importorskip("cv2")
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = tmp_path / "route.json"
+
+    result = subprocess.run([sys.executable, os.path.join(here, "route_planner_backend.py"),
+                             os.path.join(here, "img.png"), "--json_out", str(out)],
+                            cwd=tmp_path, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert len(json.loads(out.read_text())) >= 2
@@ -0,0 +1,58 @@
+"""Compact wire format round trips"""
+
+import copy
+import gzip
+import json
+
+import pytest
+
+import wire_format
+from route_analyzer import analyze_to_route_json
+
+
+@pytest.fixture(scope="module")
+def route_json():
+    return analyze_to_route_json(k=3)
+
+
+def test_expand_inverts_compact(route_json):
+    original = copy.deepcopy(route_json)
+
+    compact = wire_format.compact(route_json)
+
+    assert compact["format"] == wire_format.FORMAT_VERSION
+    assert wire_format.expand(compact) == route_json
+    assert route_json == original  # compact() leaves its input alone
+
+
+def test_holds_missing_from_the_hold_list_survive(route_json):
+    doc = copy.deepcopy(route_json)
+    doc["instructions"][0]["hold"] = dict(doc["instructions"][0]["hold"], id=999, x=1.5)
+    doc["alternatives"][1]["route"][0]["x"] = 12345
+
+    assert wire_format.expand(wire_format.compact(doc)) == doc
+
+
+def test_compact_json_is_smaller_and_decodes(route_json):
+    verbose, _ = wire_format.encode(route_json)
+    compact, mimetype = wire_format.encode(route_json, wire_format.COMPACT_JSON)
+
+    assert mimetype == wire_format.COMPACT_JSON
+    assert len(compact) < len(verbose)
+    assert wire_format.expand(json.loads(compact)) == route_json
+
+
+def test_msgpack_round_trip(route_json):
+    msgpack = pytest.importorskip("msgpack")
+    data, _ = wire_format.encode(route_json, wire_format.COMPACT_MSGPACK)
+    assert wire_format.expand(msgpack.unpackb(data)) == route_json
+
+
+def test_compress_follows_accept_encoding():
+    data = b"x" * (wire_format.COMPRESS_MIN_BYTES * 4)
+
+    body, encoding = wire_format.compress(data, "gzip;q=1.0, identity;q=0.5")
+    assert encoding == "gzip" and gzip.decompress(body) == data
+
+    assert wire_format.compress(data, "gzip;q=0") == (data, None)
+    assert wire_format.compress(data[:10], "gzip") == (data[:10], None)
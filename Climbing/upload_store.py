@@ -0,0 +1,184 @@
+"""
+Upload Store
+------------
+Content-addressed, bounded storage for uploaded wall photos.
+
+Every upload is saved under the SHA-256 of its bytes
+(``<sha256>.jpg`` / ``.png`` / ... by sniffed format), so:
+- re-uploading the same photo reuses one file instead of adding another
+- two uploads can never overwrite each other, whenever they arrive
+- the name never refers to different content, so it doubles as a strong
+  ETag and responses can be cached by browsers indefinitely
+
+Uploads saved by older versions under time-based names
+(``climbing_wall_<time>.jpg``) are still served, and count against the
+quota until they are evicted like any other file.
+
+The directory is kept under a byte quota and an optional age limit.  As in
+the analysis cache's disk tier, a file's mtime is its last-use time (saved
+or served) and the least recently used files are evicted first.
+
+Each process keeps its own index of the directory, so with several server
+workers the quota is enforced per worker against a shared directory and is
+approximate.
+
+Usage:
+    store = UploadStore("uploads", max_bytes=500_000_000, max_age=30 * 86400)
+    name = store.save(image_bytes)       # "3f2a...9c.jpg"
+    path = store.path(name)              # None once evicted
+    store.etag(name)                     # "3f2a...9c"
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+
+# (magic prefix, extension) for the image formats OpenCV reads
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"BM", ".bmp"),
+    (b"II*\x00", ".tif"),
+    (b"MM\x00*", ".tif"),
+)
+DEFAULT_EXTENSION = ".jpg"
+HASHED_NAME = re.compile(r"^([0-9a-f]{64})\.[a-z]+$")
+# Time-based names of uploads saved before the store was content-addressed
+LEGACY_NAME = re.compile(r"climbing_wall_\d+\.jpg")
+
+
+def image_extension(data):
+    """File extension for image bytes, by their magic number"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    for magic, extension in IMAGE_SIGNATURES:
+        if data.startswith(magic):
+            return extension
+    return DEFAULT_EXTENSION
+
+
+def stored_name(name):
+    """True for names the store may hold: content-addressed or legacy uploads"""
+    return bool(HASHED_NAME.fullmatch(name) or LEGACY_NAME.fullmatch(name))
+
+
+def upload_name(data):
+    """Content-addressed filename the store uses for image bytes"""
+    return hashlib.sha256(data).hexdigest() + image_extension(data)
+
+
+class UploadStore:
+    def __init__(self, directory="uploads", max_bytes=500 * 1024 * 1024, max_age=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age  # seconds since last use, None = no age limit
+        self._lock = threading.Lock()
+        self.stats = {"saved": 0, "deduplicated": 0, "evictions": 0}
+
+        # filename -> (size in bytes, last use time)
+        self._index = {}
+        self._bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        for entry in os.scandir(directory):
+            # Only adopt the store's own files, not partial writes or strays
+            if entry.is_file() and stored_name(entry.name):
+                st = entry.stat()
+                self._index[entry.name] = (st.st_size, st.st_mtime)
+                self._bytes += st.st_size
+
+    def save(self, data):
+        """Store image bytes (once per distinct content) and return the filename"""
+        name = upload_name(data)
+        with self._lock:
+            if name in self._index and self._touch(name):
+                self.stats["deduplicated"] += 1
+                return name
+
+            tmp_path = self._path(name) + f".{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(name))
+            self._forget(name, remove=False)
+            self._index[name] = (len(data), os.path.getmtime(self._path(name)))
+            self._bytes += len(data)
+            self.stats["saved"] += 1
+            self._evict(keep=name)
+        return name
+
+    def path(self, name):
+        """Absolute path of a stored file (marking it used), or None if unknown
+
+        Only content-addressed names (and the time-based names of legacy
+        uploads) are served, so partial writes (*.tmp) and other files in the
+        directory are never exposed.
+        """
+        if not stored_name(name):
+            return None
+        with self._lock:
+            if name not in self._index:
+                # Another process may have saved it into the shared directory
+                if not os.path.isfile(self._path(name)):
+                    return None
+                size = os.path.getsize(self._path(name))
+                self._index[name] = (size, time.time())
+                self._bytes += size
+            if not self._touch(name):
+                return None
+            return os.path.abspath(self._path(name))
+
+    @staticmethod
+    def etag(name):
+        """Strong ETag for a content-addressed name (None for other files)"""
+        match = HASHED_NAME.match(name)
+        return match.group(1) if match else None
+
+    def prune(self):
+        """Apply the quota and age limit now; returns the number of files evicted"""
+        with self._lock:
+            return self._evict()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, files=len(self._index), bytes=self._bytes)
+
+    # ---------------- internals (call with the lock held) ----------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _touch(self, name):
+        """Mark a file as just used; False (and forgotten) if it has vanished"""
+        try:
+            os.utime(self._path(name))  # mtime doubles as the LRU timestamp
+        except OSError:
+            self._forget(name, remove=False)
+            return False
+        self._index[name] = (self._index[name][0], time.time())
+        return True
+
+    def _evict(self, keep=None):
+        evicted = 0
+        expired_before = time.time() - self.max_age if self.max_age else None
+        for name, (_, used) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            over_quota = self._bytes > self.max_bytes
+            expired = expired_before is not None and used < expired_before
+            if not (over_quota or expired):
+                break
+            if name != keep:
+                self._forget(name)
+                evicted += 1
+        self.stats["evictions"] += evicted
+        return evicted
+
+    def _forget(self, name, remove=True):
+        size, _ = self._index.pop(name, (0, 0))
+        self._bytes -= size
+        if remove:
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
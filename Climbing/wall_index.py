@@ -0,0 +1,110 @@
+"""
+Wall Index
+----------
+Recognises walls that have already been analysed from near-duplicate photos.
+
+Each image is reduced to a difference hash (dHash): the grayscale image is
+shrunk to (HASH_SIZE + 1) x HASH_SIZE pixels and every bit records whether a
+pixel is brighter than its right-hand neighbour.  Two photos of the same wall
+taken from almost the same spot differ in only a few bits, so a lookup within
+a Hamming-distance threshold finds the known wall even though the bytes (and
+therefore any exact-content cache key) are different.
+
+A matching entry hands back the wall's hold set, rescaled if the new photo has
+a different resolution, together with any downstream stage results that were
+stored for it, so only the stages that actually changed need recomputing.
+Use one index per pipeline: the detector's and the analyzer's hold sets
+carry different fields.
+
+Usage:
+    index = WallIndex()
+    entry = index.match(img)            # img: path, encoded bytes or BGR ndarray
+    if entry is None:
+        holds = detect(img)
+        entry = index.add(img, holds)
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from image_io import load_image
+
+HASH_SIZE = 16           # hash has HASH_SIZE² bits
+MAX_HAMMING_DISTANCE = 20  # bits that may differ for two photos of the same wall
+
+
+def dhash(img, hash_size=HASH_SIZE):
+    """Difference hash of a BGR (or grayscale) image as a Python int"""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class WallEntry:
+    """A known wall: its hash, image size, hold set and cached stage results"""
+
+    def __init__(self, wall_hash, size, holds):
+        self.hash = wall_hash
+        self.size = size  # (width, height) of the photo the holds came from
+        self.holds = holds
+        self.stages = {}
+
+    def holds_for(self, size):
+        """Copy of the hold set mapped onto a photo of the given (width, height)"""
+        sx = size[0] / self.size[0]
+        sy = size[1] / self.size[1]
+        holds = []
+        for hold in self.holds:
+            hold = dict(hold)
+            for key, factor in (("x", sx), ("y", sy), ("w", sx), ("h", sy)):
+                if key in hold:
+                    hold[key] = hold[key] * factor
+            if "area" in hold:
+                hold["area"] = hold["area"] * sx * sy
+            holds.append(hold)
+        return holds
+
+
+class WallIndex:
+    def __init__(self, max_walls=256, max_distance=MAX_HAMMING_DISTANCE):
+        self.max_walls = max_walls
+        self.max_distance = max_distance
+        self._walls = OrderedDict()  # hash -> WallEntry, least recently used first
+        self._lock = threading.Lock()
+        self.stats = {"matches": 0, "misses": 0}
+
+    def match(self, img):
+        """Return the closest known WallEntry within max_distance, or None"""
+        img = load_image(img)
+        wall_hash = dhash(img)
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            for entry in self._walls.values():
+                distance = (entry.hash ^ wall_hash).bit_count()
+                if distance < best_distance:
+                    best, best_distance = entry, distance
+            if best is None:
+                self.stats["misses"] += 1
+                return None
+            self._walls.move_to_end(best.hash)
+            self.stats["matches"] += 1
+            return best
+
+    def add(self, img, holds):
+        """Register a wall and its detected holds; returns the new WallEntry"""
+        img = load_image(img)
+        height, width = img.shape[:2]
+        entry = WallEntry(dhash(img), (width, height), [dict(h) for h in holds])
+        with self._lock:
+            self._walls[entry.hash] = entry
+            self._walls.move_to_end(entry.hash)
+            while len(self._walls) > self.max_walls:
+                self._walls.popitem(last=False)
+        return entry
+
+    def __len__(self):
+        return len(self._walls)
@@ -0,0 +1,64 @@
+"""
+Warm-up
+-------
+Preload hook for the server and its worker processes.
+
+The server keeps OpenCV, NumPy and networkx out of its import path so that a
+process starts accepting requests quickly and only pays for them on first
+use.  When the server runs as a pre-forking deployment (e.g. gunicorn
+--preload) it is cheaper to import them once in the parent instead: the
+forked workers then share those pages copy-on-write.  preload() does that:
+
+- imports every module in HEAVY_MODULES that is installed
+- optionally runs one demo analysis so lazily built state is ready too
+- calls gc.freeze() so the collector does not touch (and thereby copy) the
+  preloaded objects in every child
+
+Set CLIMB_PRELOAD=1 to have server.py call it at import time.  The job queue
+also uses preload_worker() as its process-pool initializer.
+
+Usage:
+    import warmup
+    seconds = warmup.preload()        # {module: import seconds}
+"""
+
+import gc
+import time
+import importlib
+
+# Imported in this order; hold_set and image_io pull in NumPy and OpenCV
+HEAVY_MODULES = ("numpy", "cv2", "networkx", "hold_set", "image_io", "wall_index", "route_render",
+                 "route_planner_backend")
+
+
+def import_modules(modules=HEAVY_MODULES):
+    """Import each module that is installed; returns {module: seconds spent}"""
+    seconds = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        seconds[name] = time.perf_counter() - start
+    return seconds
+
+
+def preload(modules=HEAVY_MODULES, warm=True, freeze=True):
+    """Import heavy modules up front (and warm the pipeline) before forking"""
+    seconds = import_modules(modules)
+    if warm:
+        from route_analyzer import analyze_to_route_json
+
+        start = time.perf_counter()
+        analyze_to_route_json()
+        seconds["warm_analysis"] = time.perf_counter() - start
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    return seconds
+
+
+def preload_worker():
+    """Process-pool initializer: imports only, nothing to freeze in a worker"""
+    import_modules()
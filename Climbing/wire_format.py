@@ -0,0 +1,191 @@
+"""
+Wire Format
+-----------
+Compact encodings of the route JSON for /analyze responses.
+
+The verbose route JSON repeats each route hold's fields inside every
+instruction and every alternative step, and each instruction carries its
+English text twice (movement / body_position and the combined
+"instruction" sentence).  The compact form ("format": "compact/1") stores
+the same content once:
+
+- "holds" becomes {"fields": [...], "rows": [[...], ...]}.  String values
+  (colour, type, size) are ids into "texts".
+- Instructions become [hold index, limb, movement, body_position] rows.
+  The hold index points into holds["rows"], the other three are ids into
+  "texts", and the step number is the row position + 1.  "instruction" is
+  rebuilt as "Step N: <movement>. <body_position>".
+- Each alternative's "route" becomes a list of hold indices; its rank,
+  cost and main flag are kept as they are.
+- "texts" is the string table.  Every distinct movement / body_position
+  phrase is stored once and referenced by its id, like a template.
+
+A route hold that is missing from "holds" keeps its full dict in place of
+the index.  expand() turns a compact document back into the verbose one.
+
+Compact documents are sent as JSON without whitespace, or as MessagePack
+when the msgpack package is installed.  compress() applies gzip, or brotli
+when the brotli package is installed, according to Accept-Encoding.
+
+Usage:
+    compact_json = compact(route_json)
+    assert expand(compact_json) == route_json
+    body, encoding = compress(encode(route_json, COMPACT_JSON), "gzip, br")
+"""
+
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are unavailable without it
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # fall back to gzip
+    brotli = None
+
+FORMAT_VERSION = "compact/1"
+VERBOSE_JSON = "application/json"
+COMPACT_JSON = "application/vnd.climb.compact+json"
+COMPACT_MSGPACK = "application/vnd.climb.compact+msgpack"
+MSGPACK_TYPES = (COMPACT_MSGPACK, "application/msgpack", "application/x-msgpack")
+
+# Keys of the hold dict inside a verbose instruction / alternative step, in order
+INSTRUCTION_HOLD_FIELDS = ("id", "x", "y", "color", "type", "size")
+ROUTE_STEP_FIELDS = ("hold_id", "x", "y", "color", "size", "type")
+ALTERNATIVE_FIELDS = ("rank", "cost", "main")  # alternative keys besides "route", in order
+
+COMPRESS_MIN_BYTES = 1024  # smaller bodies are sent as they are
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5         # brotli's fast end; 11 is far slower for little gain here
+
+
+class _Texts:
+    """String table: each distinct string gets the next id"""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def id(self, text):
+        if text not in self.ids:
+            self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return self.ids[text]
+
+
+def compact(route_json):
+    """Compact form of a verbose route JSON (the input is not modified)"""
+    texts = _Texts()
+    holds = route_json.get("holds", [])
+    fields = list(dict.fromkeys(key for hold in holds for key in hold))
+    row_of = {hold.get("id"): row for row, hold in enumerate(holds)}
+    rows = [[texts.id(hold[key]) if isinstance(hold.get(key), str) else hold.get(key) for key in fields]
+            for hold in holds]
+    text_fields = [key for key in fields if any(isinstance(hold.get(key), str) for hold in holds)]
+
+    def hold_ref(hold, hold_id):
+        row = row_of.get(hold_id)
+        if row is not None and all(hold.get(key) == holds[row].get(key) for key in hold):
+            return row
+        return hold  # not in "holds" (or differs from it): keep it whole
+
+    instructions = []
+    for ins in route_json.get("instructions", []):
+        instructions.append([hold_ref(ins["hold"], ins["hold"]["id"]), texts.id(ins["limb"]),
+                             texts.id(ins["movement"]), texts.id(ins["body_position"])])
+
+    result = {"format": FORMAT_VERSION, "route_info": route_json.get("route_info", {}),
+              "holds": {"fields": fields, "text_fields": text_fields, "rows": rows},
+              "instructions": instructions}
+    if "alternatives" in route_json:
+        result["alternatives"] = [
+            {**{key: alt[key] for key in ALTERNATIVE_FIELDS if key in alt},
+             "route": [hold_ref({"id": step["hold_id"], **{k: step[k] for k in ROUTE_STEP_FIELDS[1:] if k in step}},
+                                step["hold_id"]) for step in alt["route"]]}
+            for alt in route_json["alternatives"]]
+    result["texts"] = texts.strings
+    return result
+
+
+def expand(compact_json):
+    """Verbose route JSON from a compact one"""
+    texts = compact_json["texts"]
+    fields = compact_json["holds"]["fields"]
+    text_fields = set(compact_json["holds"]["text_fields"])
+    holds = []
+    for row in compact_json["holds"]["rows"]:
+        hold = {}
+        for key, value in zip(fields, row):
+            if value is None:
+                continue
+            hold[key] = texts[value] if key in text_fields else value
+        holds.append(hold)
+
+    def resolve(ref):
+        return holds[ref] if isinstance(ref, int) else ref
+
+    instructions = []
+    for step, (ref, limb, movement, body_position) in enumerate(compact_json["instructions"], start=1):
+        hold = resolve(ref)
+        movement, body_position = texts[movement], texts[body_position]
+        instructions.append({
+            "step": step,
+            "hold": {key: hold[key] for key in INSTRUCTION_HOLD_FIELDS if key in hold},
+            "limb": texts[limb],
+            "movement": movement,
+            "body_position": body_position,
+            "instruction": f"Step {step}: {movement}. {body_position}"
+        })
+
+    route_json = {"route_info": compact_json["route_info"], "holds": holds, "instructions": instructions}
+    if "alternatives" in compact_json:
+        route_json["alternatives"] = []
+        for alt in compact_json["alternatives"]:
+            steps = []
+            for step, ref in enumerate(alt["route"], start=1):
+                hold = resolve(ref)
+                steps.append({"step": step, "hold_id": hold["id"],
+                              **{key: hold[key] for key in ROUTE_STEP_FIELDS[1:] if key in hold}})
+            route_json["alternatives"].append({**{key: alt[key] for key in ALTERNATIVE_FIELDS if key in alt},
+                                               "route": steps})
+    return route_json
+
+
+def available_types():
+    """Response types this process can produce, verbose (the default) first"""
+    return [VERBOSE_JSON, COMPACT_JSON] + (list(MSGPACK_TYPES) if msgpack is not None else [])
+
+
+def encode(route_json, mimetype=VERBOSE_JSON):
+    """Serialise route JSON as the given response type; returns (bytes, mimetype)"""
+    if mimetype == VERBOSE_JSON:
+        return json.dumps(route_json).encode("utf-8"), VERBOSE_JSON
+    if mimetype == COMPACT_JSON:
+        return json.dumps(compact(route_json), separators=(",", ":")).encode("utf-8"), COMPACT_JSON
+    if mimetype in MSGPACK_TYPES and msgpack is not None:
+        return msgpack.packb(compact(route_json)), COMPACT_MSGPACK
+    raise ValueError(f"Unsupported response type: {mimetype}")
+
+
+def compress(data, accept_encoding):
+    """(body, Content-Encoding or None): brotli or gzip if the client accepts it"""
+    if len(data) < COMPRESS_MIN_BYTES or not accept_encoding:
+        return data, None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return brotli.compress(data, quality=BROTLI_QUALITY), "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return gzip.compress(data, compresslevel=GZIP_LEVEL), "gzip"
+    return data, None
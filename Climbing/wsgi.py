@@ -0,0 +1,146 @@
+"""
+WSGI Entry Point
+----------------
+Production serving for the Flask app in server.py.
+
+``python server.py`` starts Flask's development server: one process, the
+debugger and reloader on, and not meant to carry load.  This module is the
+supported way to serve real traffic:
+
+- ``app`` is the WSGI callable for any WSGI server
+  (``gunicorn -c gunicorn.conf.py wsgi:app``, ``uwsgi --module wsgi:app``, ...)
+- ``python wsgi.py`` runs it under gunicorn with the settings below: N
+  pre-forked worker processes with T threads each, the app imported once in
+  the master (with CLIMB_PRELOAD so OpenCV/NumPy/networkx are shared
+  copy-on-write, see warmup.py), worker timeouts, and limits on request
+  line, header and body size
+- without gunicorn installed it falls back to a threaded single-process
+  server with the debugger and reloader off
+
+Every setting can also be given as an environment variable:
+
+    CLIMB_BIND          host:port to listen on            (0.0.0.0:8000)
+    CLIMB_WORKERS       worker processes                  (2 x cores + 1, at most 8)
+    CLIMB_THREADS       threads per worker                (4)
+    CLIMB_TIMEOUT       seconds before a silent worker is restarted   (120)
+    CLIMB_KEEPALIVE     seconds to hold idle keep-alive connections   (5)
+    CLIMB_MAX_REQUESTS  requests before a worker is recycled, 0 = never (1000)
+    MAX_UPLOAD_MB       largest request body in MB        (32, see server.py)
+
+Each worker has its own analysis cache, wall index and /jobs queue.  Job ids
+are only known to the worker that created them, so deployments that use
+/jobs should run one worker (raise CLIMB_THREADS instead) or route a
+client's requests to the same worker.  JOB_WORKERS sets the pool size of
+each worker's job queue.
+
+Usage:
+    pip install gunicorn
+    python wsgi.py --workers 4 --threads 8 --bind 0.0.0.0:8000
+    gunicorn -c gunicorn.conf.py -w 4 --threads 8 -b 0.0.0.0:8000 wsgi:app
+
+Run the gunicorn command with ``-c gunicorn.conf.py``: gunicorn only takes
+hooks such as post_fork from a config file, and without it the workers share
+the master's SQLite connection.
+"""
+
+import os
+
+# Import the heavy modules in the master before it forks (server.py reads this)
+os.environ.setdefault('CLIMB_PRELOAD', '1')
+
+import server
+
+app = server.app
+
+DEFAULT_BIND = os.environ.get('CLIMB_BIND', '0.0.0.0:8000')
+DEFAULT_WORKERS = int(os.environ.get('CLIMB_WORKERS', min(2 * (os.cpu_count() or 1) + 1, 8)))
+DEFAULT_THREADS = int(os.environ.get('CLIMB_THREADS', 4))
+DEFAULT_TIMEOUT = int(os.environ.get('CLIMB_TIMEOUT', 120))
+DEFAULT_KEEPALIVE = int(os.environ.get('CLIMB_KEEPALIVE', 5))
+DEFAULT_MAX_REQUESTS = int(os.environ.get('CLIMB_MAX_REQUESTS', 1000))
+
+# Request line / header limits handed to gunicorn (its defaults, spelled out)
+LIMIT_REQUEST_LINE = 4094
+LIMIT_REQUEST_FIELDS = 100
+LIMIT_REQUEST_FIELD_SIZE = 8190
+
+
+def post_fork(arbiter, worker):
+    """gunicorn hook: per-worker resources that must not be shared across fork"""
+    server.reopen_route_store()
+
+
+def gunicorn_options(bind=DEFAULT_BIND, workers=DEFAULT_WORKERS, threads=DEFAULT_THREADS,
+                     timeout=DEFAULT_TIMEOUT, keepalive=DEFAULT_KEEPALIVE, max_requests=DEFAULT_MAX_REQUESTS):
+    """gunicorn settings for serving app"""
+    return {
+        "bind": bind,
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "preload_app": True,
+        "timeout": timeout,
+        "graceful_timeout": min(timeout, 30),
+        "keepalive": keepalive,
+        "max_requests": max_requests,
+        # Spread restarts out so workers are not all recycled at once
+        "max_requests_jitter": max_requests // 10,
+        "limit_request_line": LIMIT_REQUEST_LINE,
+        "limit_request_fields": LIMIT_REQUEST_FIELDS,
+        "limit_request_field_size": LIMIT_REQUEST_FIELD_SIZE,
+        "post_fork": post_fork,
+        "accesslog": "-",
+    }
+
+
+def serve(options):
+    """Run app under gunicorn, or a threaded fallback server if it is not installed"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is None:
+        from werkzeug.serving import run_simple
+
+        host, _, port = options["bind"].rpartition(":")
+        print("gunicorn is not installed (pip install gunicorn); "
+              f"serving with one process and threads on {options['bind']}")
+        run_simple(host or "0.0.0.0", int(port), app, threaded=True,
+                   use_debugger=False, use_reloader=False)
+        return
+
+    class ClimbApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    print(f"Serving on {options['bind']} with {options['workers']} workers x {options['threads']} threads")
+    ClimbApplication().run()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the route analyzer for production traffic")
+    parser.add_argument("--bind", default=DEFAULT_BIND, help="host:port to listen on")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="Threads per worker")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT,
+                        help="Seconds a worker may stay silent before it is restarted")
+    parser.add_argument("--keepalive", type=int, default=DEFAULT_KEEPALIVE,
+                        help="Seconds to wait for the next request on a keep-alive connection")
+    parser.add_argument("--max-requests", type=int, default=DEFAULT_MAX_REQUESTS,
+                        help="Recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--max-upload-mb", type=float, default=None,
+                        help="Largest accepted request body in MB (default: MAX_UPLOAD_MB or 32)")
+    args = parser.parse_args()
+
+    if args.max_upload_mb is not None:
+        server.MAX_UPLOAD_BYTES = int(args.max_upload_mb * 1024 * 1024)
+        app.config['MAX_CONTENT_LENGTH'] = server.MAX_UPLOAD_BYTES
+    serve(gunicorn_options(args.bind, args.workers, args.threads, args.timeout,
+                           args.keepalive, args.max_requests))